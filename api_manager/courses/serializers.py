@@ -15,11 +15,6 @@ class CourseModuleCompletionSerializer(serializers.ModelSerializer):
         read_only = ('id', 'created')
 
 
-class GradeSerializer(serializers.Serializer):
-    """ Serializer for model interactions """
-    grade = serializers.Field()
-
-
 class CourseLeadersSerializer(serializers.Serializer):
     """ Serializer for course leaderboard """
     id = serializers.IntegerField(source='student__id')
@@ -29,6 +24,15 @@ class CourseLeadersSerializer(serializers.Serializer):
     points_scored = serializers.IntegerField()
 
 
+class CourseScoreLeadersSerializer(serializers.Serializer):
+    """ Serializer for course leaderboard read from the per-user score table """
+    id = serializers.IntegerField(source='user__id')
+    username = serializers.CharField(source='user__username')
+    title = serializers.CharField(source='user__profile__title')
+    avatar_url = serializers.CharField(source='user__profile__avatar_url')
+    points_scored = serializers.IntegerField()
+
+
 class CourseCompletionsLeadersSerializer(serializers.Serializer):
     """ Serializer for course completions leaderboard """
     id = serializers.IntegerField(source='user__id')
@@ -13,17 +13,24 @@ from urllib import urlencode
 from django.contrib.auth.models import Group
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError
 from django.test import TestCase, Client
 from django.test.utils import override_settings
 
 from capa.tests.response_xml_factory import StringResponseXMLFactory
+from courseware.models import StudentModule
 from courseware.tests.factories import StudentModuleFactory
 from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
 from django_comment_common.models import Role, FORUM_ROLE_MODERATOR
 from instructor.access import allow_access
 from student.tests.factories import UserFactory, CourseEnrollmentFactory
+from xmodule.modulestore.django import SignalHandler
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 
+from api_manager.courseware_access import get_aggregate_exclusion_user_ids, get_course_cache_stats, get_course_key
+from api_manager.models import CourseModuleCompletion, CourseUserCompletionCount, CourseUserScore, \
+    get_course_cache_generation, invalidate_course_cache
+
 from .content import TEST_COURSE_OVERVIEW_CONTENT, TEST_COURSE_UPDATES_CONTENT, TEST_COURSE_UPDATES_CONTENT_LEGACY
 from .content import TEST_STATIC_TAB1_CONTENT, TEST_STATIC_TAB2_CONTENT
 
@@ -288,6 +295,39 @@ class CoursesApiTests(TestCase):
             response = self.do_get(resource['uri'])
             self.assertEqual(response.status_code, 200)
 
+    def test_courses_detail_get_cached_descriptor(self):
+        test_uri = self.base_courses_uri + '/' + self.test_course_id
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        hits = get_course_cache_stats()['hits']
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.test_course_id)
+        self.assertGreater(get_course_cache_stats()['hits'], hits)
+
+    def test_courses_detail_get_cache_invalidated(self):
+        test_uri = self.base_courses_uri + '/' + self.test_course_id
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        invalidate_course_cache(self.course.id)
+        misses = get_course_cache_stats()['misses']
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.test_course_id)
+        self.assertGreater(get_course_cache_stats()['misses'], misses)
+
+    def test_courses_detail_get_invalidated_on_publish(self):
+        generation = get_course_cache_generation(self.course.id)
+        SignalHandler.course_published.send(sender=None, course_key=self.course.id)
+        self.assertNotEqual(get_course_cache_generation(self.course.id), generation)
+
+    def test_courses_key_parsing_memoized(self):
+        course_key = get_course_key(self.test_course_id)
+        self.assertEqual(course_key, self.course.id)
+        self.assertIs(get_course_key(self.test_course_id), course_key)
+        self.assertIsNone(get_course_key('invalid course identifier'))
+        self.assertIsNone(get_course_key('invalid course identifier'))
+
     def test_courses_detail_get_notfound(self):
         test_uri = self.base_courses_uri + '/' + self.test_bogus_course_id
         response = self.do_get(test_uri)
@@ -313,6 +353,44 @@ class CoursesApiTests(TestCase):
         self.assertEqual(sequence['name'], 'Video_Sequence')
         self.assertNotIn('children', sequence)
 
+    def test_courses_tree_get_cached_outline(self):
+        test_uri = self.base_courses_uri + '/' + self.test_course_id + '?depth=3'
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        content = response.data['content']
+        with mock.patch('api_manager.courseware_access._build_course_outline') as mock_build_outline:
+            response = self.do_get(test_uri)
+            self.assertFalse(mock_build_outline.called)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['content'], content)
+        sequence = response.data['content'][0]['children'][0]
+        self.assertEqual(sequence['name'], 'Video_Sequence')
+        self.assertEqual(sequence['children'][0]['category'], 'video')
+        confirm_uri = self.test_server_prefix + self.base_course_content_uri + '/' + sequence['id']
+        self.assertEqual(sequence['uri'], confirm_uri)
+
+    @override_settings(API_CACHE_CHUNK_SIZE=64)
+    def test_courses_tree_get_cached_outline_chunked(self):
+        test_uri = self.base_courses_uri + '/' + self.test_course_id + '?depth=3'
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        content = response.data['content']
+        outline_key = 'api_manager.course_outline_chunks.{}.{}'.format(
+            self.test_course_id, get_course_cache_generation(self.course.id)
+        )
+        self.assertGreater(cache.get(outline_key), 1)
+        with mock.patch('api_manager.courseware_access._build_course_outline') as mock_build_outline:
+            response = self.do_get(test_uri)
+            self.assertFalse(mock_build_outline.called)
+        self.assertEqual(response.data['content'], content)
+
+        # losing any chunk rebuilds the outline
+        cache.delete('{}.0'.format(outline_key))
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['content'], content)
+        self.assertIsNotNone(cache.get('{}.0'.format(outline_key)))
+
     def test_courses_tree_get_root(self):
         # query the course tree to quickly get naviation information
         test_uri = self.base_courses_uri + '/' + self.test_course_id + '?depth=0'
@@ -411,6 +489,71 @@ class CoursesApiTests(TestCase):
                 matched_child = True
         self.assertTrue(matched_child)
 
+    def test_course_content_list_get_recursive(self):
+        test_uri = self.base_course_content_uri + '?type=video&recursive=true'
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['id'], self.test_content_child_id)
+        self.assertEqual(response.data[0]['category'], 'video')
+        confirm_uri = '{}{}/{}'.format(self.test_server_prefix, self.base_course_content_uri, self.test_content_child_id)
+        self.assertEqual(response.data[0]['uri'], confirm_uri)
+
+        test_uri = '{}/{}/children?type=video&recursive=true'.format(self.base_course_content_uri, self.test_course_content_id)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+        test_uri = '{}/{}/children?type=video&recursive=true'.format(self.base_course_content_uri, unicode(self.course_project.scope_ids.usage_id))
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 0)
+
+    def test_course_content_get_staff_only(self):
+        staff_only = ItemFactory.create(
+            category="sequential",
+            parent_location=self.chapter.location,
+            display_name="Staff Only Sequence",
+            metadata={'visible_to_staff_only': True}
+        )
+        staff_only_id = unicode(staff_only.scope_ids.usage_id)
+        test_uri = '{}/{}'.format(self.base_course_content_uri, staff_only_id)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 404)
+        response = self.do_get(test_uri + '/children')
+        self.assertEqual(response.status_code, 404)
+
+        test_uri = '{}/{}/children'.format(self.base_course_content_uri, unicode(self.chapter.scope_ids.usage_id))
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        child_ids = [child['id'] for child in response.data]
+        self.assertIn(self.test_course_content_id, child_ids)
+        self.assertNotIn(staff_only_id, child_ids)
+
+    def test_course_content_list_get_recursive_staff_only(self):
+        staff_only = ItemFactory.create(
+            category="chapter",
+            parent_location=self.course.location,
+            display_name="Staff Only Chapter",
+            metadata={'visible_to_staff_only': True}
+        )
+        staff_only_video = ItemFactory.create(
+            category="video",
+            parent_location=staff_only.location,
+            display_name="Staff Only Video"
+        )
+        hidden_ids = [unicode(staff_only.scope_ids.usage_id), unicode(staff_only_video.scope_ids.usage_id)]
+        response = self.do_get(self.base_course_content_uri + '?recursive=true')
+        self.assertEqual(response.status_code, 200)
+        content_ids = [content['id'] for content in response.data]
+        self.assertIn(self.test_course_content_id, content_ids)
+        for hidden_id in hidden_ids:
+            self.assertNotIn(hidden_id, content_ids)
+
+        response = self.do_get(self.base_course_content_uri + '?type=video&recursive=true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([content['id'] for content in response.data], [self.test_content_child_id])
+
     def test_course_content_list_get_notfound(self):
         test_uri = '{}{}/children?type=video'.format(self.base_course_content_uri, self.test_bogus_content_id)
         response = self.do_get(test_uri)
@@ -608,6 +751,23 @@ class CoursesApiTests(TestCase):
         self.assertEqual(len(intro_video['attributes']), 1)
         self.assertEqual(intro_video['attributes']['data-videoid'], 'foobar')
 
+    def test_courses_overview_get_parsed_cached(self):
+        test_uri = self.base_courses_uri + '/' + self.test_course_id + '/overview?parse=true'
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        sections = response.data['sections']
+        with mock.patch('api_manager.courses.views._parse_overview_html') as mock_parse:
+            response = self.do_get(test_uri)
+            self.assertFalse(mock_parse.called)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['sections'], sections)
+
+        invalidate_course_cache(self.course.id)
+        with mock.patch('api_manager.courses.views._parse_overview_html', return_value=[]) as mock_parse:
+            response = self.do_get(test_uri)
+            self.assertTrue(mock_parse.called)
+        self.assertEqual(response.status_code, 200)
+
     def test_courses_overview_get_invalid_course(self):
         #try a bogus course_id to test failure case
         test_uri = '{}/{}/overview'.format(self.base_courses_uri, self.test_bogus_course_id)
@@ -652,6 +812,48 @@ class CoursesApiTests(TestCase):
         self.assertEqual(postings[3]['date'], 'April 15, 2014')
         self.assertEqual(postings[3]['content'], '<p>A perfectly</p><p>formatted piece</p><p>of HTML</p>')
 
+    def test_courses_updates_get_filtered(self):
+        test_uri = self.base_courses_uri + '/' + self.test_course_id + '/updates?parse=true&limit=2'
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        postings = response.data['postings']
+        self.assertEqual(len(postings), 2)
+        self.assertEqual(postings[0]['date'], 'April 18, 2014')
+        self.assertEqual(postings[1]['date'], 'April 17, 2014')
+
+        test_uri = self.base_courses_uri + '/' + self.test_course_id + '/updates?parse=true&since=2014-04-16'
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        postings = response.data['postings']
+        self.assertEqual(len(postings), 3)
+        self.assertEqual(postings[2]['date'], 'April 16, 2014')
+
+        test_uri = self.base_courses_uri + '/' + self.test_course_id + '/updates?parse=true&since=yesterday'
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 400)
+
+        test_uri = self.base_courses_uri + '/' + self.test_course_id + '/updates?parse=true&limit=all'
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 400)
+
+    def test_courses_updates_get_not_modified(self):
+        test_uri = self.base_courses_uri + '/' + self.test_course_id + '/updates?parse=true'
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertGreater(len(etag), 0)
+        headers = {
+            'Content-Type': 'application/json',
+            'X-Edx-Api-Key': str(TEST_API_KEY),
+        }
+        with mock.patch('api_manager.courses.views.get_course_info_section') as mock_info_section:
+            response = self.client.get(test_uri, headers=headers, HTTP_IF_NONE_MATCH=etag)
+            self.assertFalse(mock_info_section.called)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(test_uri + '&limit=1', headers=headers, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['postings']), 1)
+
     def test_courses_updates_get_invalid_course(self):
         #try a bogus course_id to test failure case
         test_uri = '{}/{}/updates'.format(self.base_courses_uri, self.test_bogus_course_id)
@@ -731,6 +933,28 @@ class CoursesApiTests(TestCase):
         self.assertEqual(tabs[1]['id'], u'readings')
         self.assertEqual(tabs[1]['content'], self.static_tab2.data)
 
+    def test_static_tab_list_get_changed_versions(self):
+        test_uri = self.base_courses_uri + '/' + self.test_course_id + '/static_tabs?detail=true'
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        tabs = response.data['tabs']
+        self.assertEqual(len(tabs), 2)
+        syllabus_version = tabs[0]['version']
+        self.assertIsNotNone(syllabus_version)
+
+        with mock.patch('api_manager.courses.views.get_static_tab_contents') as mock_render:
+            response = self.do_get(test_uri)
+            self.assertFalse(mock_render.called)
+        self.assertEqual(response.data['tabs'][0]['content'], self.static_tab1.data)
+
+        test_uri = '{}&versions=syllabus:{},readings:stale'.format(test_uri, syllabus_version)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        tabs = response.data['tabs']
+        self.assertEqual(len(tabs), 1)
+        self.assertEqual(tabs[0]['id'], u'readings')
+        self.assertEqual(tabs[0]['content'], self.static_tab2.data)
+
     def test_static_tab_list_get_invalid_course(self):
         #try a bogus course_id to test failure case
         test_uri = self.base_courses_uri + '/' + self.test_bogus_course_id + '/static_tabs'
@@ -881,6 +1105,44 @@ class CoursesApiTests(TestCase):
         response = self.do_get(test_uri)
         self.assertEqual(response.status_code, 200)
 
+    def test_courses_users_list_get_paged_and_streamed(self):
+        course = CourseFactory.create(display_name="TEST COURSE", org='TESTORG3')
+        users = [UserFactory.create(username="paged_user" + str(i)) for i in xrange(3)]
+        for user in users:
+            CourseEnrollmentFactory.create(user=user, course_id=course.id)
+        test_uri = self.base_courses_uri + '/' + unicode(course.id) + '/users'
+        response = self.do_post(test_uri, {'email': 'test+pending@tester.com', 'allow_pending': True})
+        self.assertEqual(response.status_code, 201)
+
+        response = self.do_get(test_uri + '?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['id'] for user in response.data['enrollments']], [users[0].id, users[1].id])
+        self.assertEqual(response.data['pending_enrollments'], ['test+pending@tester.com'])
+        self.assertIn('after_id={}'.format(users[1].id), response.data['next'])
+
+        response = self.do_get('{}?page_size=2&after_id={}'.format(test_uri, users[1].id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['id'] for user in response.data['enrollments']], [users[2].id])
+        self.assertIsNone(response.data['next'])
+        self.assertNotIn('pending_enrollments', response.data)
+
+        response = self.do_get(test_uri + '?after_id=abc')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.do_get(test_uri + '?stream=true')
+        self.assertEqual(response.status_code, 200)
+        streamed = json.loads(response.content)
+        self.assertEqual([user['id'] for user in streamed['enrollments']], [user.id for user in users])
+        self.assertEqual(streamed['enrollments'][0]['username'], users[0].username)
+        self.assertEqual(streamed['pending_enrollments'], ['test+pending@tester.com'])
+
+        # rows are fetched in keyset batches
+        with override_settings(API_STREAM_BATCH_SIZE=2):
+            response = self.do_get(test_uri + '?stream=true')
+        streamed = json.loads(response.content)
+        self.assertEqual([user['id'] for user in streamed['enrollments']], [user.id for user in users])
+        self.assertEqual(streamed['pending_enrollments'], ['test+pending@tester.com'])
+
     def test_courses_users_list_get_filter_by_orgs(self):
         # create 5 users
         users = []
@@ -1383,6 +1645,60 @@ class CoursesApiTests(TestCase):
         response = self.do_post(completions_uri, completions_data)
         self.assertEqual(response.status_code, 400)
 
+    def test_coursemodulecompletions_post_batch(self):
+        completions_uri = '{}/{}/completions/'.format(self.base_courses_uri, self.test_course_id)
+        response = self.do_post(completions_uri, {'content_id': self.test_chapter_id, 'user_id': self.users[0].id})
+        self.assertEqual(response.status_code, 201)
+
+        completions_data = [
+            {'content_id': self.test_chapter_id, 'user_id': self.users[0].id},
+            {'content_id': self.test_chapter_id, 'user_id': self.users[1].id, 'stage': 'First'},
+            {'content_id': self.test_chapter_id, 'user_id': self.users[1].id, 'stage': 'First'},
+            {'content_id': self.test_course_content_id, 'user_id': self.users[1].id},
+            {'content_id': self.test_bogus_content_id, 'user_id': self.users[1].id},
+            {'content_id': self.test_chapter_id},
+            {'content_id': self.test_chapter_id, 'user_id': 987654},
+            {'content_id': self.test_chapter_id, 'user_id': self.users[1].id + 0.9},
+            {'content_id': self.test_chapter_id, 'user_id': True},
+        ]
+        response = self.do_post(completions_uri, completions_data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data], [409, 201, 409, 201, 400, 400, 400, 400, 400])
+        self.assertEqual(response.data[1]['content_id'], self.test_chapter_id)
+        self.assertEqual(response.data[1]['stage'], 'First')
+        self.assertEqual(CourseModuleCompletion.objects.filter(user=self.users[1]).count(), 2)
+        counter = CourseUserCompletionCount.objects.get(user=self.users[1], course_id=self.test_course_id)
+        self.assertEqual(counter.completions, 2)
+
+        test_uri = '{}/{}/metrics/completions/leaders/'.format(self.base_courses_uri, self.test_course_id)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['leaders'][0]['id'], self.users[1].id)
+
+        response = self.do_post('{}/{}/completions/'.format(self.base_courses_uri, self.test_bogus_course_id),
+                                completions_data)
+        self.assertEqual(response.status_code, 404)
+
+    def test_coursemodulecompletions_get_keyset_paged(self):
+        completions_uri = '{}/{}/completions/'.format(self.base_courses_uri, self.test_course_id)
+        for user in self.users:
+            response = self.do_post(completions_uri, {'content_id': self.test_chapter_id, 'user_id': user.id})
+            self.assertEqual(response.status_code, 201)
+
+        response = self.do_get('{}?after_id=0&page_size=2'.format(completions_uri))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([completion['user_id'] for completion in response.data['results']],
+                         [user.id for user in self.users[:2]])
+        seen_user_ids = [completion['user_id'] for completion in response.data['results']]
+        while response.data['next']:
+            response = self.do_get(response.data['next'])
+            self.assertEqual(response.status_code, 200)
+            seen_user_ids.extend([completion['user_id'] for completion in response.data['results']])
+        self.assertEqual(seen_user_ids, [user.id for user in self.users])
+
+        response = self.do_get('{}?after_id=abc'.format(completions_uri))
+        self.assertEqual(response.status_code, 400)
+
     def test_course_module_completions_post_invalid_course(self):
         completions_uri = '{}/{}/completions/'.format(self.base_courses_uri, self.test_bogus_course_id)
         completions_data = {'content_id': unicode(self.course_content.scope_ids.usage_id), 'user_id': self.users[0].id}
@@ -1566,6 +1882,229 @@ class CoursesApiTests(TestCase):
         response = self.do_get(content_filter_uri)
         self.assertEqual(response.status_code, 400)
 
+    def test_courses_leaders_list_get_score_table(self):
+        test_user = UserFactory.create(username="testuserscoretable")
+        module = StudentModuleFactory.create(
+            grade=10,
+            max_grade=10,
+            student=test_user,
+            course_id=self.course.id,
+            module_state_key=self.item.location,
+            module_type='mentoring'
+        )
+        score = CourseUserScore.objects.get(user=test_user, course_id=self.test_course_id)
+        self.assertEqual(score.points_scored, 10)
+        self.assertEqual(score.points_possible, 10)
+
+        test_uri = '{}/{}/metrics/proficiency/leaders/?user_id={}'\
+            .format(self.base_courses_uri, self.test_course_id, test_user.id)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['position'], 1)
+        self.assertEqual(response.data['points'], 10)
+        self.assertEqual(response.data['leaders'][0]['id'], test_user.id)
+        self.assertEqual(response.data['leaders'][0]['username'], test_user.username)
+
+        # A re-graded module is reflected in the score table on save
+        module.grade = 0
+        module.save()
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['points'], 0)
+        self.assertNotEqual(response.data['leaders'][0]['id'], test_user.id)
+
+        module.delete()
+        self.assertFalse(CourseUserScore.objects.filter(user=test_user, course_id=self.test_course_id).exists())
+
+    def test_courses_leaders_list_score_table_recalculated(self):
+        test_user = UserFactory.create(username="testuserscorerecalculated")
+        module = StudentModuleFactory.create(
+            grade=4,
+            max_grade=10,
+            student=test_user,
+            course_id=self.course.id,
+            module_state_key=self.item.location,
+            module_type='mentoring'
+        )
+        other_module = StudentModuleFactory.create(
+            grade=3,
+            max_grade=5,
+            student=test_user,
+            course_id=self.course.id,
+            module_state_key=self.course_content.location,
+            module_type='mentoring'
+        )
+        score = CourseUserScore.objects.get(user=test_user, course_id=self.test_course_id)
+        self.assertEqual((score.points_scored, score.points_possible), (7, 15))
+
+        # The new grade of the saved module replaces its previous one
+        module.grade = 9
+        module.save()
+        score = CourseUserScore.objects.get(user=test_user, course_id=self.test_course_id)
+        self.assertEqual((score.points_scored, score.points_possible), (12, 15))
+
+        # Ungraded saves leave the score alone
+        module.state = json.dumps({'position': 2})
+        module.save()
+        score = CourseUserScore.objects.get(user=test_user, course_id=self.test_course_id)
+        self.assertEqual((score.points_scored, score.points_possible), (12, 15))
+
+        module.delete()
+        score = CourseUserScore.objects.get(user=test_user, course_id=self.test_course_id)
+        self.assertEqual((score.points_scored, score.points_possible), (3, 5))
+        other_module.delete()
+        self.assertFalse(CourseUserScore.objects.filter(user=test_user, course_id=self.test_course_id).exists())
+
+    def test_courses_leaders_list_score_table_graded_to_ungraded(self):
+        test_user = UserFactory.create(username="testuserscoreungraded")
+        module = StudentModuleFactory.create(
+            grade=4,
+            max_grade=10,
+            student=test_user,
+            course_id=self.course.id,
+            module_state_key=self.item.location,
+            module_type='mentoring'
+        )
+        StudentModuleFactory.create(
+            grade=3,
+            max_grade=5,
+            student=test_user,
+            course_id=self.course.id,
+            module_state_key=self.course_content.location,
+            module_type='mentoring'
+        )
+        module.grade = None
+        module.max_grade = None
+        module.save()
+        score = CourseUserScore.objects.get(user=test_user, course_id=self.test_course_id)
+        self.assertEqual((score.points_scored, score.points_possible), (3, 5))
+
+    def test_courses_leaders_list_score_table_concurrent_update(self):
+        test_user = UserFactory.create(username="testuserscoreconcurrentupdate")
+        module = StudentModuleFactory.create(
+            grade=4,
+            max_grade=10,
+            student=test_user,
+            course_id=self.course.id,
+            module_state_key=self.item.location,
+            module_type='mentoring'
+        )
+        StudentModuleFactory.create(
+            grade=3,
+            max_grade=5,
+            student=test_user,
+            course_id=self.course.id,
+            module_state_key=self.course_content.location,
+            module_type='mentoring'
+        )
+        first = StudentModule.objects.get(pk=module.pk)
+        second = StudentModule.objects.get(pk=module.pk)
+        stale_grade = [(module.grade, module.max_grade)]
+        first.grade = 6
+        first.save()
+
+        filter_modules = StudentModule.objects.filter
+
+        def filter_stale(*args, **kwargs):
+            # The second save read the stored grade before the first one was written
+            if 'pk' in kwargs:
+                return mock.Mock(values_list=mock.Mock(return_value=stale_grade))
+            return filter_modules(*args, **kwargs)
+
+        second.grade = 9
+        with mock.patch.object(StudentModule.objects, 'filter', side_effect=filter_stale):
+            second.save()
+        score = CourseUserScore.objects.get(user=test_user, course_id=self.test_course_id)
+        self.assertEqual((score.points_scored, score.points_possible), (12, 15))
+
+    def test_courses_leaders_list_score_table_concurrent_create(self):
+        test_user = UserFactory.create(username="testuserscoreconcurrent")
+
+        def create_concurrently(**kwargs):
+            # Another grade write creates the row between the lookup and the insert
+            CourseUserScore.objects.create(points_scored=5, points_possible=5, **kwargs)
+            raise IntegrityError()
+
+        with mock.patch.object(CourseUserScore.objects, 'get_or_create', side_effect=create_concurrently):
+            StudentModuleFactory.create(
+                grade=3,
+                max_grade=10,
+                student=test_user,
+                course_id=self.course.id,
+                module_state_key=self.item.location,
+                module_type='mentoring'
+            )
+        # The concurrently created row is recalculated from the stored grades
+        score = CourseUserScore.objects.get(user=test_user, course_id=self.test_course_id)
+        self.assertEqual((score.points_scored, score.points_possible), (3, 10))
+
+    def test_courses_leaders_list_get_position_score_count(self):
+        test_uri = '{}/{}/metrics/proficiency/leaders/?user_id={}'\
+            .format(self.base_courses_uri, self.test_course_id, self.users[2].id)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['position'], 3)
+
+        # A score change re-ranks the course
+        item = ItemFactory.create(
+            parent_location=self.sub_section.location,
+            category='mentoring',
+            display_name=u"test rank problem"
+        )
+        StudentModuleFactory.create(
+            grade=10,
+            max_grade=10,
+            student=self.users[2],
+            course_id=self.course.id,
+            module_state_key=item.location,
+            module_type='mentoring'
+        )
+        response = self.do_get(test_uri)
+        self.assertEqual(response.data['position'], 1)
+        self.assertEqual(response.data['points'], 14.5)
+
+    def test_courses_leaders_list_get_position_inactive_and_excluded(self):
+        test_uri = '{}/{}/metrics/proficiency/leaders/?user_id={}'\
+            .format(self.base_courses_uri, self.test_course_id, self.users[2].id)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.data['position'], 3)
+
+        # Deactivating a user is copied to their score row, which then drops out of position counts
+        self.users[4].is_active = False
+        self.users[4].save()
+        score = CourseUserScore.objects.get(user=self.users[4], course_id=self.test_course_id)
+        self.assertFalse(score.user_is_active)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.data['position'], 2)
+
+        allow_access(self.course, self.users[3], 'observer')
+        response = self.do_get(test_uri)
+        self.assertEqual(response.data['position'], 1)
+
+        self.users[4].is_active = True
+        self.users[4].save()
+        response = self.do_get(test_uri)
+        self.assertEqual(response.data['position'], 2)
+
+    def test_courses_leaders_list_get_cached_exclusions(self):
+        course_key = get_course_key(self.test_course_id)
+        self.assertEqual(get_aggregate_exclusion_user_ids(course_key), set())
+
+        # Granting an excluded role invalidates the cached exclusion set
+        allow_access(self.course, self.users[USER_COUNT-1], 'observer')
+        self.assertEqual(get_aggregate_exclusion_user_ids(course_key), set([self.users[USER_COUNT-1].id]))
+
+        test_uri = '{}/{}/metrics/proficiency/leaders/'.format(self.base_courses_uri, self.test_course_id)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['course_avg'], 3.4)
+
+        # Large exclusion sets are applied as a subquery, with the same results
+        with override_settings(API_AGGREGATE_EXCLUSION_SUBQUERY_THRESHOLD=0):
+            response = self.do_get(test_uri)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['course_avg'], 3.4)
+
     def test_courses_completions_leaders_list_get(self):
 
         completion_uri = '{}/{}/completions/'.format(self.base_courses_uri, unicode(self.course.id))
@@ -1633,6 +2172,33 @@ class CoursesApiTests(TestCase):
         response = self.do_get(test_uri)
         self.assertEqual(response.status_code, 404)
 
+    def test_courses_completions_leaders_list_get_counters(self):
+        completion_uri = '{}/{}/completions/'.format(self.base_courses_uri, self.test_course_id)
+        response = self.do_post(completion_uri, {'content_id': self.test_chapter_id, 'user_id': self.users[0].id})
+        self.assertEqual(response.status_code, 201)
+        response = self.do_post(completion_uri, {'content_id': self.test_course_content_id,
+                                                 'user_id': self.users[0].id})
+        self.assertEqual(response.status_code, 201)
+        response = self.do_post(completion_uri, {'content_id': self.test_chapter_id, 'user_id': self.users[1].id})
+        self.assertEqual(response.status_code, 201)
+        counter = CourseUserCompletionCount.objects.get(user=self.users[0], course_id=self.test_course_id)
+        self.assertEqual(counter.completions, 2)
+
+        # Completions recorded in other courses must not be counted against this one
+        other_course = CourseFactory.create()
+        CourseModuleCompletion.objects.create(user=self.users[2], course_id=unicode(other_course.id),
+                                              content_id=unicode(other_course.location))
+
+        test_uri = '{}/{}/metrics/completions/leaders/?user_id={}'\
+            .format(self.base_courses_uri, self.test_course_id, self.users[1].id)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['course_avg'], 1.5)
+        self.assertEqual(response.data['position'], 2)
+        self.assertEqual(response.data['completions'], 1)
+        self.assertEqual(response.data['leaders'][0]['id'], self.users[0].id)
+        self.assertEqual(response.data['leaders'][0]['completions'], 2)
+
     def test_courses_grades_list_get(self):
         # Retrieve the list of grades for this course
         # All the course/item/user scaffolding was handled in Setup
@@ -1678,6 +2244,33 @@ class CoursesApiTests(TestCase):
         response = self.do_get(content_filter_uri)
         self.assertEqual(response.status_code, 400)
 
+    def test_courses_grades_list_get_paged(self):
+        test_uri = '{}/{}/grades'.format(self.base_courses_uri, self.test_course_id)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        grades = response.data['grades']
+        self.assertGreater(len(grades), 1)
+
+        response = self.do_get('{}?page_size=1'.format(test_uri))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['grades']), 1)
+        self.assertEqual(response.data['points_scored'], response.data['course_points_scored'])
+        self.assertIsNotNone(response.data['next'])
+        paged_grades = response.data['grades']
+        next_uri = response.data['next']
+        while next_uri:
+            response = self.do_get(next_uri)
+            self.assertEqual(response.status_code, 200)
+            paged_grades.extend(response.data['grades'])
+            next_uri = response.data['next']
+        self.assertEqual(
+            sorted(grade['grade'] for grade in paged_grades),
+            sorted(grade['grade'] for grade in grades)
+        )
+
+        response = self.do_get('{}?page_size=all'.format(test_uri))
+        self.assertEqual(response.status_code, 400)
+
     def test_courses_grades_list_get_invalid_course(self):
         # Retrieve the list of grades for this course
         # All the course/item/user scaffolding was handled in Setup
@@ -1,6 +1,9 @@
 """ API implementation for course-oriented interactions. """
 
 from collections import OrderedDict
+from datetime import datetime
+import hashlib
+import json
 import logging
 import itertools
 from lxml import etree
@@ -8,9 +11,11 @@ from StringIO import StringIO
 
 from django.conf import settings
 from django.contrib.auth.models import Group, User
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 from django.db.models import Avg, Sum, Count
-from django.http import Http404
+from django.http import Http404, HttpResponse
 from django.utils.translation import ugettext_lazy as _
 from django.db.models import Q
 
@@ -23,20 +28,25 @@ from courseware.views import get_static_tab_contents
 from django_comment_common.models import FORUM_ROLE_MODERATOR
 from instructor.access import revoke_access, update_forum_role
 from student.models import CourseEnrollment, CourseEnrollmentAllowed
-from student.roles import CourseRole, CourseAccessRole, CourseInstructorRole, CourseStaffRole, CourseObserverRole, UserBasedRole
+from student.roles import CourseAccessRole, CourseInstructorRole, CourseStaffRole, CourseObserverRole, UserBasedRole
 
 from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.exceptions import ItemNotFoundError
 
-from api_manager.courseware_access import get_course, get_course_child
+from api_manager.courseware_access import get_course, get_course_descriptor, get_course_child_descriptor, \
+    get_course_cache_generation, get_course_outline, get_course_outline_descendants, get_usage_key, \
+    get_accessible_children, get_accessible_outline_nodes, \
+    get_aggregate_exclusion_filter, get_aggregate_exclusion_user_ids
 from api_manager.models import CourseGroupRelationship, CourseContentGroupRelationship, GroupProfile, \
-    CourseModuleCompletion
-from api_manager.permissions import SecureAPIView, SecureListAPIView
+    CourseModuleCompletion, CourseUserCompletionCount, CourseUserScore
+from api_manager.permissions import PaginationMixin, SecureAPIView, SecureListAPIView
 from api_manager.users.serializers import UserSerializer, UserCountByCitySerializer
-from api_manager.utils import generate_base_uri
+from api_manager.utils import generate_base_uri, generate_next_page_uri, get_group_list_values, \
+    get_keyset_page_params, is_int, str2bool, TimedLRUCache
 from projects.models import Project, Workgroup
 from projects.serializers import ProjectSerializer, BasicWorkgroupSerializer
 from .serializers import CourseModuleCompletionSerializer
-from .serializers import GradeSerializer, CourseLeadersSerializer, CourseCompletionsLeadersSerializer
+from .serializers import CourseLeadersSerializer, CourseCompletionsLeadersSerializer, CourseScoreLeadersSerializer
 
 from lms.lib.comment_client.user import get_course_social_stats
 from lms.lib.comment_client.utils import CommentClientRequestError
@@ -45,6 +55,11 @@ from opaque_keys.edx.keys import CourseKey
 
 log = logging.getLogger(__name__)
 
+STATIC_TAB_CACHE = TimedLRUCache(
+    max_size=getattr(settings, 'API_STATIC_TAB_CACHE_SIZE', 500),
+    timeout=getattr(settings, 'API_STATIC_TAB_CACHE_TIMEOUT', 3600)
+)
+
 
 def _get_content_children(content, content_type=None):
     """
@@ -63,6 +78,23 @@ def _get_content_children(content, content_type=None):
     return children
 
 
+def _get_content_uri(request, course_key, content_id):
+    """
+    Builds the API uri of a course, or of a content entity within it
+    """
+    protocol = 'http'
+    if request.is_secure():
+        protocol = protocol + 's'
+    content_uri = '{}://{}/api/courses/{}'.format(
+        protocol,
+        request.get_host(),
+        unicode(course_key)
+    )
+    if content_id != unicode(course_key):
+        content_uri = '{}/content/{}'.format(content_uri, content_id)
+    return content_uri
+
+
 def _serialize_content(request, content_key, content_descriptor):
     """
     Loads the specified content object into the response dict
@@ -80,24 +112,11 @@ def _serialize_content(request, content_key, content_descriptor):
 
     data['category'] = content_descriptor.location.category
 
-    protocol = 'http'
-    if request.is_secure():
-        protocol = protocol + 's'
-    content_uri = '{}://{}/api/courses/{}'.format(
-        protocol,
-        request.get_host(),
-        unicode(content_key)
-    )
-
     # Some things we do only if the content object is a course
     if (unicode(content_key) == content_id):
         data['number'] = content_descriptor.location.course
         data['org'] = content_descriptor.location.org
-
-    # Other things we do only if the content object is not a course
-    else:
-        content_uri = '{}/content/{}'.format(content_uri, content_id)
-    data['uri'] = content_uri
+    data['uri'] = _get_content_uri(request, content_key, content_id)
 
     if hasattr(content_descriptor, 'due'):
         data['due'] = content_descriptor.due
@@ -124,25 +143,20 @@ def _serialize_content_children(request, course_key, children):
     return data
 
 
-def _serialize_content_with_children(request, course_key, descriptor, depth):  # pylint: disable=C0103
+def _serialize_outline(request, course_key, outline, node_ids, depth=0):
     """
-    Serializes course content and then dives into the content tree,
-    serializing each child module until specified depth limit is hit
+    Serializes the specified nodes of the course outline index and their
+    descendants down to the specified depth, without touching the modulestore.
+    Nodes hold the same fields _serialize_content reads from a descriptor
     """
-    data = _serialize_content(
-        request,
-        course_key,
-        descriptor
-    )
-    if depth > 0:
-        data['children'] = []
-        for child in descriptor.get_children():
-            data['children'].append(_serialize_content_with_children(
-                request,
-                course_key,
-                child,
-                depth - 1
-            ))
+    data = []
+    for node_id in node_ids:
+        node = outline['nodes'][node_id]
+        node_data = dict(node['data'])
+        node_data['uri'] = _get_content_uri(request, course_key, node_id)
+        if depth > 0:
+            node_data['children'] = _serialize_outline(request, course_key, outline, node['children'], depth - 1)
+        data.append(node_data)
     return data
 
 
@@ -230,6 +244,34 @@ def _parse_overview_html(html):
     return result
 
 
+def _get_content_hash(html):
+    """
+    Returns a stable digest of the provided HTML content
+    """
+    if isinstance(html, unicode):
+        html = html.encode('utf-8')
+    return hashlib.md5(html).hexdigest()
+
+
+def _get_parsed_html(course_key, section, html, parser):
+    """
+    Returns the result of parser(html) for a section of the course (overview,
+    updates). Parsing is a pure function of the HTML, so results are cached by
+    content hash and discarded when the course is published
+    """
+    cache_key = 'api_manager.course_{}.{}.{}.{}'.format(
+        section,
+        unicode(course_key),
+        get_course_cache_generation(course_key),
+        _get_content_hash(html)
+    )
+    parsed = cache.get(cache_key)
+    if parsed is None:
+        parsed = parser(html)
+        cache.set(cache_key, parsed, getattr(settings, 'API_COURSE_OVERVIEW_CACHE_TIMEOUT', 86400))
+    return parsed
+
+
 def _parse_updates_html(html):
     """
     Helper method to extract updates contained within the course info HTML into components
@@ -261,21 +303,118 @@ def _parse_updates_html(html):
         if posting_date_element is not None:
             posting_data['date'] = posting_date_element.text
 
-        content = u''
+        content = []
         for current_element in posting:
             # note, we can't delete or skip over the date element in
             # the HTML tree because there might be some tailing content
             if current_element != posting_date_element:
-                content += etree.tostring(current_element)
-            else:
-                content += current_element.tail if current_element.tail else u''
+                content.append(etree.tostring(current_element))
+            elif current_element.tail:
+                content.append(current_element.tail)
 
-        posting_data['content'] = content.strip()
+        posting_data['content'] = u''.join(content).strip()
         result.append(posting_data)
 
     return result
 
 
+def _get_course_info_version(course_key, section):
+    """
+    Returns a version token for a course info section (updates, handouts) derived
+    from its stored data, without rendering it
+    """
+    try:
+        section_descriptor = modulestore().get_item(course_key.make_usage_key('course_info', section))
+    except ItemNotFoundError:
+        return None
+    return _get_content_hash(section_descriptor.data)
+
+
+def _get_static_tab_version(course_key, tab):
+    """
+    Returns the raw data of a static tab along with a version token derived from it
+    """
+    try:
+        tab_descriptor = modulestore().get_item(course_key.make_usage_key('static_tab', tab.url_slug))
+    except ItemNotFoundError:
+        return None, None
+    return tab_descriptor.data, _get_content_hash(tab_descriptor.data)
+
+
+def _render_static_tab(request, course_descriptor, tab, data, version):
+    """
+    Renders the contents of a static tab, reusing previously rendered content
+    for the same course, tab and content version. Tabs which reference the
+    requesting student (%%USER_ID%%) are rendered every time
+    """
+    cacheable = version is not None and '%%USER_ID%%' not in data
+    cache_key = (unicode(course_descriptor.id), tab.url_slug, version)
+    if cacheable:
+        contents = STATIC_TAB_CACHE.get(cache_key)
+        if contents is not None:
+            return contents
+    contents = get_static_tab_contents(
+        request,
+        course_descriptor,
+        tab,
+        wrap_xmodule_display=False
+    )
+    if cacheable and contents is not None:
+        STATIC_TAB_CACHE.set(cache_key, contents)
+    return contents
+
+
+def _posted_since(posting, since):
+    """
+    Checks whether an update posting is dated on or after the provided datetime
+    Postings without a recognizable date are never filtered out
+    """
+    try:
+        posted = datetime.strptime((posting.get('date') or '').strip(), '%B %d, %Y')
+    except ValueError:
+        return True
+    return posted >= since
+
+
+def _iterate_in_batches(queryset, fields, batch_size):
+    """
+    Yields the values of fields (the first of which must be 'id') for the rows of
+    queryset in id order, fetching batch_size rows per query. The database driver
+    buffers whole result sets client-side, so this keeps memory use bounded
+    """
+    last_id = None
+    while True:
+        batch = queryset.order_by('id')
+        if last_id is not None:
+            batch = batch.filter(id__gt=last_id)
+        batch = list(batch.values_list(*fields)[:batch_size])
+        for row in batch:
+            yield row
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1][0]
+
+
+def _stream_course_users(base_uri, user_rows, pending_emails):
+    """
+    Generator yielding the CoursesUsersList JSON document piece by piece, so
+    that enrollments never have to be held in memory all at once
+    """
+    yield '{{"uri": {}, "enrollments": ['.format(json.dumps(base_uri))
+    separator = ''
+    for user_id, email, username in user_rows:
+        yield separator + json.dumps(OrderedDict([('id', user_id), ('email', email), ('username', username)]))
+        separator = ', '
+    yield ']'
+    separator = ', "pending_enrollments": ['
+    for email in pending_emails:
+        yield separator + json.dumps(email)
+        separator = ', '
+    if separator == ', ':
+        yield ']'
+    yield '}'
+
+
 def _manage_role(course_descriptor, user, role, action):
     """
     Helper method for managing course/forum roles
@@ -306,27 +445,6 @@ def _manage_role(course_descriptor, user, role, action):
                 update_forum_role(course_descriptor.id, user, FORUM_ROLE_MODERATOR, 'revoke')
 
 
-def _get_aggregate_exclusion_user_ids(course_key):
-    """
-    This helper method will return the list of user ids that are marked in roles
-    that can be excluded from certain aggregate queries. The list of roles to exclude
-    can be defined in a AGGREGATION_EXCLUDE_ROLES settings variable
-    """
-
-    exclude_user_ids = set()
-    exclude_role_list = getattr(settings, 'AGGREGATION_EXCLUDE_ROLES', [CourseObserverRole.ROLE])
-
-    for role in exclude_role_list:
-        users = CourseRole(role, course_key).users_with_role()
-        user_ids = set()
-        for user in users:
-            user_ids.add(user.id)
-
-        exclude_user_ids = exclude_user_ids.union(user_ids)
-
-    return exclude_user_ids
-
-
 class CourseContentList(SecureAPIView):
     """
     **Use Case**
@@ -355,8 +473,15 @@ class CourseContentList(SecureAPIView):
 
         GET /api/courses/{course_id}/content?type=video
 
+        GET /api/courses/{course_id}/content?type=video&recursive=true
+
         GET /api/courses/{course_id}/content/{content_id}/children
 
+        Setting the optional recursive parameter to true returns all of the
+        descendants of the content entity (optionally filtered by type) in
+        course order, rather than only its direct children. Descendants the
+        user may not load (staff-only or not yet released) are left out.
+
     **Response Values**
 
         * category: The type of content.
@@ -374,19 +499,41 @@ class CourseContentList(SecureAPIView):
         """
         GET /api/courses/{course_id}/content
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         if content_id is None:
             content_id = course_id
         response_data = []
         content_type = request.QUERY_PARAMS.get('type', None)
+        recursive = str2bool(request.QUERY_PARAMS.get('recursive', 'false'))
+        outline = get_course_outline(course_key)
         if course_id != content_id:
-            content_descriptor, content_key, content = get_course_child(request, request.user, course_key, content_id)  # pylint: disable=W0612
+            node_id = unicode(get_usage_key(content_id))
+        else:
+            node_id = outline['root'] if outline else None
+        if outline and node_id in outline['nodes']:
+            if course_id != content_id and not get_accessible_outline_nodes(request.user, course_key, outline, [node_id]):
+                return Response(response_data, status=status.HTTP_404_NOT_FOUND)
+            if recursive:
+                child_ids = get_course_outline_descendants(outline, node_id, content_type)
+            else:
+                child_ids = [
+                    child_id for child_id in outline['nodes'][node_id]['children']
+                    if content_type is None or outline['nodes'][child_id]['data']['category'] == content_type
+                ]
+            if course_id != content_id or recursive:
+                child_ids = get_accessible_outline_nodes(request.user, course_key, outline, child_ids)
+            response_data = _serialize_outline(request, course_key, outline, child_ids)
+            return Response(response_data, status=status.HTTP_200_OK)
+        if course_id != content_id:
+            content, content_key = get_course_child_descriptor(request.user, course_key, content_id)  # pylint: disable=W0612
         else:
             content = course_descriptor
         if content:
             children = _get_content_children(content, content_type)
+            if course_id != content_id:
+                children = get_accessible_children(request.user, course_key, children)
             response_data = _serialize_content_children(
                 request,
                 course_key,
@@ -449,13 +596,13 @@ class CourseContentDetail(SecureAPIView):
         """
         GET /api/courses/{course_id}/content/{content_id}
         """
-        content, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        content, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         response_data = {}
         base_uri = generate_base_uri(request)
         response_data['uri'] = base_uri
         if course_id != content_id:
             element_name = 'children'
-            content_descriptor, content_key, content = get_course_child(request, request.user, course_key, content_id)  # pylint: disable=W0612
+            content, content_key = get_course_child_descriptor(request.user, course_key, content_id)  # pylint: disable=W0612
         else:
             element_name = 'content'
             protocol = 'http'
@@ -475,6 +622,8 @@ class CourseContentDetail(SecureAPIView):
         )
         content_type = request.QUERY_PARAMS.get('type', None)
         children = _get_content_children(content, content_type)
+        if course_id != content_id:
+            children = get_accessible_children(request.user, course_key, children)
         response_data[element_name] = _serialize_content_children(
             request,
             course_id,
@@ -589,16 +738,18 @@ class CoursesDetail(SecureAPIView):
         depth_int = int(depth)
         # get_course_by_id raises an Http404 if the requested course is invalid
         # Rather than catching it, we just let it bubble up
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
-        if depth_int > 0:
-            response_data = _serialize_content_with_children(
+        outline = get_course_outline(course_key) if depth_int > 0 else None
+        if outline:
+            response_data = _serialize_outline(
                 request,
                 course_key,
-                course_descriptor,  # Primer for recursive function
+                outline,
+                [outline['root']],
                 depth_int
-            )
+            )[0]
             response_data['content'] = response_data['children']
             response_data.pop('children')
         else:
@@ -662,6 +813,7 @@ class CoursesGroupsList(SecureAPIView):
     * Example: Display all of the courses for a particular academic series/program
     * If a relationship already exists between a Course and a particular group, the system returns 409 Conflict
     * The 'type' parameter filters groups by their 'group_type' field ('workgroup', 'series', etc.)
+    * The 'fields' parameter selects the group attributes returned, among id, name and type (default id,name)
     """
 
     def post(self, request, course_id):
@@ -671,7 +823,7 @@ class CoursesGroupsList(SecureAPIView):
         response_data = {}
         group_id = request.DATA['group_id']
         base_uri = generate_base_uri(request)
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         try:
@@ -698,9 +850,9 @@ class CoursesGroupsList(SecureAPIView):
 
     def get(self, request, course_id):
         """
-        GET /api/courses/{course_id}/groups?type=workgroup
+        GET /api/courses/{course_id}/groups?type=workgroup&fields=id,name,type
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         group_type = request.QUERY_PARAMS.get('type', None)
@@ -708,11 +860,7 @@ class CoursesGroupsList(SecureAPIView):
 
         if group_type:
             course_groups = course_groups.filter(group__groupprofile__group_type=group_type)
-        response_data = []
-        for course_group in course_groups:
-            group_profile = GroupProfile.objects.get(group_id=course_group.group_id)
-            group_data = {'id': course_group.group_id, 'name': group_profile.name}
-            response_data.append(group_data)
+        response_data = get_group_list_values(course_groups, request.QUERY_PARAMS.get('fields', None), 'group__')
         response_status = status.HTTP_200_OK
         return Response(response_data, status=response_status)
 
@@ -732,7 +880,7 @@ class CoursesGroupsDetail(SecureAPIView):
         """
         GET /api/courses/{course_id}/groups/{group_id}
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         try:
@@ -754,7 +902,7 @@ class CoursesGroupsDetail(SecureAPIView):
         """
         DELETE /api/courses/{course_id}/groups/{group_id}
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_204_NO_CONTENT)
         try:
@@ -797,14 +945,14 @@ class CoursesOverview(SecureAPIView):
         GET /api/courses/{course_id}/overview
         """
         response_data = OrderedDict()
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         existing_content = get_course_about_section(course_descriptor, 'overview')
         if not existing_content:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         if request.GET.get('parse') and request.GET.get('parse') in ['True', 'true']:
-            response_data['sections'] = _parse_overview_html(existing_content)
+            response_data['sections'] = _get_parsed_html(course_key, 'overview', existing_content, _parse_overview_html)
         else:
             response_data['overview_html'] = existing_content
         return Response(response_data, status=status.HTTP_200_OK)
@@ -825,6 +973,15 @@ class CoursesUpdates(SecureAPIView):
 
           GET /api/courses/{course_id}/updates?parse=true
 
+          GET /api/courses/{course_id}/updates?parse=true&limit=5&since=2014-04-16
+
+        When parse is true, the optional limit parameter returns only the
+        latest postings and the optional since parameter (YYYY-MM-DD) returns
+        only postings dated on or after that day. Postings with an unrecognized
+        date are always included. Responses carry an ETag header; clients
+        polling for new postings can send it back in If-None-Match and receive
+        a 304 Not Modified when nothing has changed.
+
     **Response Values**
 
         * content: The HTML representation of the course overview.
@@ -839,18 +996,43 @@ class CoursesUpdates(SecureAPIView):
         """
         GET /api/courses/{course_id}/updates
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         response_data = OrderedDict()
+        # The ETag is derived from the stored updates and the course version, so that
+        # unchanged content is answered with a 304 before anything is rendered
+        version = _get_course_info_version(course_key, 'updates')
+        if version is None:
+            return Response({}, status=status.HTTP_404_NOT_FOUND)
+        etag = '"{}"'.format(hashlib.md5('{}.{}?{}'.format(
+            get_course_cache_generation(course_key),
+            version,
+            request.GET.urlencode()
+        )).hexdigest())
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
         content = get_course_info_section(request, course_descriptor, 'updates')
         if not content:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         if request.GET.get('parse') and request.GET.get('parse') in ['True', 'true']:
-            response_data['postings'] = _parse_updates_html(content)
+            postings = _get_parsed_html(course_key, 'updates', content, _parse_updates_html)
+            since = request.GET.get('since')
+            if since:
+                try:
+                    since = datetime.strptime(since, '%Y-%m-%d')
+                except ValueError:
+                    return Response({}, status=status.HTTP_400_BAD_REQUEST)
+                postings = [posting for posting in postings if _posted_since(posting, since)]
+            limit = request.GET.get('limit')
+            if limit:
+                if not is_int(limit) or int(limit) < 0:
+                    return Response({}, status=status.HTTP_400_BAD_REQUEST)
+                postings = postings[:int(limit)]
+            response_data['postings'] = postings
         else:
             response_data['content'] = content
-        return Response(response_data)
+        return Response(response_data, headers={'ETag': etag})
 
 
 class CoursesStaticTabsList(SecureAPIView):
@@ -867,6 +1049,12 @@ class CoursesStaticTabsList(SecureAPIView):
 
           GET /api/courses/{course_id}/static_tabs?detail=true
 
+          GET /api/courses/{course_id}/static_tabs?detail=true&versions=syllabus:{version},readings:{version}
+
+        When detail=true, the optional versions parameter lists the content
+        versions the client already has; those tabs are left out of the
+        response so that only changed pages are returned.
+
     **Response Values**
 
         * tabs: The collection of custom pages in the course. Each object in the
@@ -877,29 +1065,36 @@ class CoursesStaticTabsList(SecureAPIView):
           * name: The Display Name of the custom page.
 
           * detail: When detail=true, the content of the custom page as HTML.
+
+          * version: When detail=true, the version of the custom page content.
     """
 
     def get(self, request, course_id):
         """
         GET /api/courses/{course_id}/static_tabs
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         response_data = OrderedDict()
         tabs = []
+        detail = request.GET.get('detail') and request.GET.get('detail') in ['True', 'true']
+        known_versions = {}
+        if request.GET.get('versions'):
+            for known_version in request.GET.get('versions').split(','):
+                url_slug, _separator, version = known_version.partition(':')
+                known_versions[url_slug] = version
         for tab in course_descriptor.tabs:
             if tab.type == 'static_tab':
                 tab_data = OrderedDict()
                 tab_data['id'] = tab.url_slug
                 tab_data['name'] = tab.name
-                if request.GET.get('detail') and request.GET.get('detail') in ['True', 'true']:
-                    tab_data['content'] = get_static_tab_contents(
-                        request,
-                        course_descriptor,
-                        tab,
-                        wrap_xmodule_display=False
-                    )
+                if detail:
+                    data, version = _get_static_tab_version(course_key, tab)
+                    if version is not None and known_versions.get(tab.url_slug) == version:
+                        continue
+                    tab_data['version'] = version
+                    tab_data['content'] = _render_static_tab(request, course_descriptor, tab, data, version)
                 tabs.append(tab_data)
         response_data['tabs'] = tabs
         return Response(response_data)
@@ -926,32 +1121,31 @@ class CoursesStaticTabsDetail(SecureAPIView):
           * name: The Display Name of the custom page.
 
           * detail: The content of the custom page as HTML.
+
+          * version: The version of the custom page content.
     """
 
     def get(self, request, course_id, tab_id):
         """
         GET /api/courses/{course_id}/static_tabs/{tab_id}
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         response_data = OrderedDict()
         for tab in course_descriptor.tabs:
             if tab.type == 'static_tab' and tab.url_slug == tab_id:
+                data, version = _get_static_tab_version(course_key, tab)
                 response_data['id'] = tab.url_slug
                 response_data['name'] = tab.name
-                response_data['content'] = get_static_tab_contents(
-                    request,
-                    course_descriptor,
-                    tab,
-                    wrap_xmodule_display=False
-                )
+                response_data['version'] = version
+                response_data['content'] = _render_static_tab(request, course_descriptor, tab, data, version)
         if not response_data:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         return Response(response_data, status=status.HTTP_200_OK)
 
 
-class CoursesUsersList(SecureAPIView):
+class CoursesUsersList(PaginationMixin, SecureAPIView):
     """
     **Use Case**
 
@@ -987,6 +1181,12 @@ class CoursesUsersList(SecureAPIView):
         * GET supports exclude filtering of user by groups
          * To get users enrolled in a course and also not member of specific groups
          ```/api/courses/{course_id}/users?exclude_groups={group_id1},{group_id2}```
+        * GET supports keyset pagination for large courses, ordered by user id
+         * ```/api/courses/{course_id}/users?page_size=100``` returns the first page and a next uri
+         * ```/api/courses/{course_id}/users?page_size=100&after_id={last_user_id}``` returns the following page
+        * GET supports streaming the complete enrollment list for large courses
+         ```/api/courses/{course_id}/users?stream=true```
+         * rows are read API_STREAM_BATCH_SIZE (default 1000) at a time, so memory use does not grow with the course
 
 
     **Post Values**
@@ -999,7 +1199,7 @@ class CoursesUsersList(SecureAPIView):
         """
         POST /api/courses/{course_id}/users
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         if 'user_id' in request.DATA:
@@ -1039,7 +1239,7 @@ class CoursesUsersList(SecureAPIView):
         response_data = OrderedDict()
         base_uri = generate_base_uri(request)
         response_data['uri'] = base_uri
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         # Get a list of all enrolled students
@@ -1055,21 +1255,53 @@ class CoursesUsersList(SecureAPIView):
             exclude_groups = exclude_groups.split(",")[:upper_bound]
             users = users.exclude(groups__in=exclude_groups)
 
+        stream = str2bool(request.QUERY_PARAMS.get('stream'))
+        # A stream is only split into pages when page_size is passed explicitly
+        page_params = get_keyset_page_params(request, None if stream else self.paginate_by, self.max_paginate_by)
+        if page_params is None:
+            return Response({}, status=status.HTTP_400_BAD_REQUEST)
+        after_id, page_size = page_params
+        if after_id is not None:
+            users = users.filter(id__gt=after_id)
+        user_rows = users.order_by('id').values_list('id', 'email', 'username')
+        if page_size:
+            user_rows = user_rows[:page_size]
+
+        # Then list all enrollments which are pending. These are enrollments for students that have not yet
+        # created an account. When paging, they are only returned with the first page
+        pending_enrollments = []
+        if after_id is None:
+            pending_enrollments = CourseEnrollmentAllowed.objects.filter(course_id=course_key)
+
+        if stream:
+            # The response body is produced lazily, one batch of rows at a time
+            batch_size = getattr(settings, 'API_STREAM_BATCH_SIZE', 1000)
+            if not page_size:
+                user_rows = _iterate_in_batches(users, ('id', 'email', 'username'), batch_size)
+            pending_emails = (
+                email for pending_id, email in _iterate_in_batches(pending_enrollments, ('id', 'email'), batch_size)
+            ) if after_id is None else []
+            return HttpResponse(
+                _stream_course_users(base_uri, user_rows, pending_emails),
+                content_type='application/json'
+            )
+
         response_data['enrollments'] = []
-        for user in users:
+        for user_id, email, username in user_rows:
             user_data = OrderedDict()
-            user_data['id'] = user.id
-            user_data['email'] = user.email
-            user_data['username'] = user.username
+            user_data['id'] = user_id
+            user_data['email'] = email
+            user_data['username'] = username
             response_data['enrollments'].append(user_data)
+        if page_size:
+            response_data['next'] = generate_next_page_uri(
+                request, page_size, [enrollment['id'] for enrollment in response_data['enrollments']]
+            )
 
-        # Then list all enrollments which are pending. These are enrollments for students that have not yet
-        # created an account
-        pending_enrollments = CourseEnrollmentAllowed.objects.filter(course_id=course_key)
-        if pending_enrollments:
-            response_data['pending_enrollments'] = []
-            for cea in pending_enrollments:
-                response_data['pending_enrollments'].append(cea.email)
+        if after_id is None:
+            pending_emails = list(pending_enrollments.values_list('email', flat=True))
+            if pending_emails:
+                response_data['pending_enrollments'] = pending_emails
         return Response(response_data)
 
 
@@ -1129,7 +1361,7 @@ class CoursesUsersDetail(SecureAPIView):
             user = User.objects.get(id=user_id, is_active=True)
         except ObjectDoesNotExist:
             return Response({}, status=status.HTTP_204_NO_CONTENT)
-        course_descriptor, course_key, course_content = get_course(request, user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         CourseEnrollment.unenroll(user, course_key)
@@ -1162,10 +1394,10 @@ class CourseContentGroupsList(SecureAPIView):
         """
         POST /api/courses/{course_id}/content/{content_id}/groups
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
-        content_descriptor, content_key, existing_content = get_course_child(request, request.user, course_key, content_id)  # pylint: disable=W0612
+        existing_content, content_key = get_course_child_descriptor(request.user, course_key, content_id)  # pylint: disable=W0612
         if not existing_content:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         group_id = request.DATA.get('group_id')
@@ -1203,10 +1435,10 @@ class CourseContentGroupsList(SecureAPIView):
         """
         response_data = []
         group_type = request.QUERY_PARAMS.get('type')
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
-        content_descriptor, content_key, existing_content = get_course_child(request, request.user, course_key, content_id)  # pylint: disable=W0612
+        existing_content, content_key = get_course_child_descriptor(request.user, course_key, content_id)  # pylint: disable=W0612
         if not existing_content:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         relationships = CourseContentGroupRelationship.objects.filter(
@@ -1235,10 +1467,10 @@ class CourseContentGroupsDetail(SecureAPIView):
         """
         GET /api/courses/{course_id}/content/{content_id}/groups/{group_id}
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
-        content_descriptor, content_key, existing_content = get_course_child(request, request.user, course_key, content_id)  # pylint: disable=W0612
+        existing_content, content_key = get_course_child_descriptor(request.user, course_key, content_id)  # pylint: disable=W0612
         if not existing_content:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         try:
@@ -1276,10 +1508,10 @@ class CourseContentUsersList(SecureAPIView):
         """
         GET /api/courses/{course_id}/content/{content_id}/users
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
-        content_descriptor, content_key, existing_content = get_course_child(request, request.user, course_key, content_id)  # pylint: disable=W0612
+        existing_content, content_key = get_course_child_descriptor(request.user, course_key, content_id)  # pylint: disable=W0612
         if not existing_content:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         enrolled = self.request.QUERY_PARAMS.get('enrolled', 'True')
@@ -1306,6 +1538,23 @@ class CourseContentUsersList(SecureAPIView):
         return Response(serializer.data)  # pylint: disable=E1101
 
 
+def _get_completion_content_id(user, course_key, outline, content_id):
+    """
+    Returns the identifier a completion of the specified content is stored under, or None if the content
+    does not exist or the user may not load it. The course outline index is checked first so that most
+    lookups avoid the modulestore
+    """
+    content_key = get_usage_key(content_id)
+    if content_key is not None and outline is not None and unicode(content_key) in outline['nodes'] \
+            and unicode(content_key) != unicode(course_key) \
+            and not outline['nodes'][unicode(content_key)].get('restricted', True):
+        return unicode(content_key)
+    existing_content, content_key = get_course_child_descriptor(user, course_key, content_id)  # pylint: disable=W0612
+    if not existing_content:
+        return None
+    return unicode(existing_content.location)
+
+
 class CourseModuleCompletionList(SecureListAPIView):
     """
     ### The CourseModuleCompletionList allows clients to view user's course module completion entities
@@ -1335,6 +1584,9 @@ class CourseModuleCompletionList(SecureListAPIView):
     ```/api/courses/{course_id}/completions/?user_id={user_id}```
     ```/api/courses/{course_id}/completions/?content_id={content_id}&stage={stage}```
     ```/api/courses/{course_id}/completions/?user_id={user_id}&content_id={content_id}```
+    To page through large result sets by keyset rather than by page number, pass after_id (0 for the first page)
+    and follow the returned next uri
+    ```/api/courses/{course_id}/completions/?after_id=0&page_size=100```
     - POST: Creates a Course-Module completion entity
     - POST Example:
         {
@@ -1342,9 +1594,12 @@ class CourseModuleCompletionList(SecureListAPIView):
             "user_id":4,
             "stage": "First"
         }
+    - POST a list of such objects to record a batch of completions at once. The response lists, in order,
+    each completion with a status of 201 (created), 409 (already exists) or 400 (invalid)
     ### Use Cases/Notes:
     * Use GET operation to retrieve list of course completions by user
     * Use GET operation to verify user has completed specific course module
+    * Use batch POST operation to sync completions recorded offline
     """
     serializer_class = CourseModuleCompletionSerializer
 
@@ -1356,7 +1611,7 @@ class CourseModuleCompletionList(SecureListAPIView):
         content_id = self.request.QUERY_PARAMS.get('content_id', None)
         stage = self.request.QUERY_PARAMS.get('stage', None)
         course_id = self.kwargs['course_id']
-        course_descriptor, course_key, course_content = get_course(self.request, self.request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             raise Http404
         queryset = CourseModuleCompletion.objects.filter(course_id=course_key)
@@ -1366,7 +1621,7 @@ class CourseModuleCompletionList(SecureListAPIView):
             queryset = queryset.filter(user__in=user_ids)
 
         if content_id:
-            content_descriptor, content_key, existing_content = get_course_child(self.request, self.request.user, course_key, content_id)  # pylint: disable=W0612
+            existing_content, content_key = get_course_child_descriptor(self.request.user, course_key, content_id)  # pylint: disable=W0612
             if not existing_content:
                 raise Http404
             queryset = queryset.filter(content_id=existing_content.location)
@@ -1376,10 +1631,30 @@ class CourseModuleCompletionList(SecureListAPIView):
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """
+        GET /api/courses/{course_id}/completions/?after_id={last_completion_id}
+        """
+        if request.QUERY_PARAMS.get('after_id', None) is None:
+            return super(CourseModuleCompletionList, self).list(request, *args, **kwargs)
+        page_params = get_keyset_page_params(request, self.paginate_by, self.max_paginate_by)
+        if page_params is None:
+            return Response({}, status=status.HTTP_400_BAD_REQUEST)
+        after_id, page_size = page_params
+        completions = list(self.get_queryset().filter(id__gt=after_id).order_by('id')[:page_size])
+        serializer = self.get_serializer(completions, many=True)
+        response_data = {
+            'next': generate_next_page_uri(request, page_size, [completion.id for completion in completions]),
+            'results': serializer.data  # pylint: disable=E1101
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
+
     def post(self, request, course_id):
         """
         POST /api/courses/{course_id}/completions/
         """
+        if isinstance(request.DATA, list):
+            return self._post_batch(request, course_id)
         content_id = request.DATA.get('content_id', None)
         user_id = request.DATA.get('user_id', None)
         stage = request.DATA.get('stage', None)
@@ -1387,16 +1662,18 @@ class CourseModuleCompletionList(SecureListAPIView):
             return Response({'message': _('content_id is missing')}, status.HTTP_400_BAD_REQUEST)
         if not user_id:
             return Response({'message': _('user_id is missing')}, status.HTTP_400_BAD_REQUEST)
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
-        content_descriptor, content_key, existing_content = get_course_child(request, request.user, course_key, content_id)  # pylint: disable=W0612
-        if not existing_content:
+        completion_content_id = _get_completion_content_id(
+            request.user, course_key, get_course_outline(course_key), content_id
+        )
+        if not completion_content_id:
             return Response({'message': _('content_id is invalid')}, status.HTTP_400_BAD_REQUEST)
 
         completion, created = CourseModuleCompletion.objects.get_or_create(user_id=user_id,
                                                                            course_id=course_key,
-                                                                           content_id=existing_content.location,
+                                                                           content_id=completion_content_id,
                                                                            stage=stage)
         serializer = CourseModuleCompletionSerializer(completion)
         if created:
@@ -1404,6 +1681,74 @@ class CourseModuleCompletionList(SecureListAPIView):
         else:
             return Response({'message': _('Resource already exists')}, status=status.HTTP_409_CONFLICT)
 
+    def _post_batch(self, request, course_id):
+        """
+        POST /api/courses/{course_id}/completions/ with a list of completions
+        """
+        upper_bound = getattr(settings, 'API_COMPLETION_BATCH_UPPER_BOUND', 1000)
+        if len(request.DATA) > upper_bound:
+            return Response({'message': _('Too many completions in a single request')},
+                            status.HTTP_400_BAD_REQUEST)
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
+        if not course_descriptor:
+            return Response({}, status=status.HTTP_404_NOT_FOUND)
+        outline = get_course_outline(course_key)
+
+        results = []
+        for item in request.DATA:
+            item = item if isinstance(item, dict) else {}
+            result = {
+                'user_id': item.get('user_id', None),
+                'content_id': item.get('content_id', None),
+                'stage': item.get('stage', None),
+            }
+            if not result['content_id'] or not isinstance(result['content_id'], basestring):
+                result.update(status=status.HTTP_400_BAD_REQUEST, message=_('content_id is missing'))
+            elif not is_int(result['user_id']):
+                result.update(status=status.HTTP_400_BAD_REQUEST, message=_('user_id is missing'))
+            else:
+                result['user_id'] = int(result['user_id'])
+                completion_content_id = _get_completion_content_id(
+                    request.user, course_key, outline, result['content_id']
+                )
+                if completion_content_id:
+                    result['content_id'] = completion_content_id
+                else:
+                    result.update(status=status.HTTP_400_BAD_REQUEST, message=_('content_id is invalid'))
+            results.append(result)
+
+        pending = [pending_result for pending_result in results if 'status' not in pending_result]
+        user_ids = set(pending_result['user_id'] for pending_result in pending)
+        existing_user_ids = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        existing = set(CourseModuleCompletion.objects.filter(
+            course_id=course_key,
+            user__in=existing_user_ids,
+            content_id__in=set(pending_result['content_id'] for pending_result in pending)
+        ).values_list('user', 'content_id', 'stage'))
+
+        completions = []
+        created_counts = {}
+        for result in pending:
+            completion_key = (result['user_id'], result['content_id'], result['stage'])
+            if result['user_id'] not in existing_user_ids:
+                result.update(status=status.HTTP_400_BAD_REQUEST, message=_('user_id is invalid'))
+            elif completion_key in existing:
+                result.update(status=status.HTTP_409_CONFLICT, message=_('Resource already exists'))
+            else:
+                existing.add(completion_key)
+                result['status'] = status.HTTP_201_CREATED
+                completions.append(CourseModuleCompletion(user_id=result['user_id'], course_id=unicode(course_key),
+                                                          content_id=result['content_id'], stage=result['stage']))
+                created_counts[result['user_id']] = created_counts.get(result['user_id'], 0) + 1
+
+        if completions:
+            with transaction.commit_on_success():
+                CourseModuleCompletion.objects.bulk_create(completions)
+                # bulk_create bypasses the post_save receivers maintaining the counters
+                for user_id, created_count in created_counts.iteritems():
+                    CourseUserCompletionCount.increment(unicode(course_key), user_id, created_count)
+        return Response(results, status=status.HTTP_200_OK)
+
 
 class CoursesGradesList(SecureListAPIView):
     """
@@ -1412,13 +1757,14 @@ class CoursesGradesList(SecureListAPIView):
     - GET: Returns a JSON representation (array) of the set of grade objects
     ### Use Cases/Notes:
     * Example: Display a graph of all of the grades awarded for a given course
+    * The grades array can be paginated by passing page_size (and after_id, taken from the next uri)
     """
 
     def get(self, request, course_id):  # pylint: disable=W0221
         """
         GET /api/courses/{course_id}/grades?user_ids=1,2&content_ids=i4x://1/2/3,i4x://a/b/c
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         queryset = StudentModule.objects.filter(
@@ -1436,39 +1782,48 @@ class CoursesGradesList(SecureListAPIView):
 
         content_id = self.request.QUERY_PARAMS.get('content_id', None)
         if content_id:
-            content_descriptor, content_key, existing_content = get_course_child(request, request.user, course_key, content_id)  # pylint: disable=W0612
+            existing_content, content_key = get_course_child_descriptor(self.request.user, course_key, content_id)  # pylint: disable=W0612
             if not existing_content:
                 return Response({}, status=status.HTTP_400_BAD_REQUEST)
             queryset = queryset.filter(module_state_key=existing_content.location)
 
-        queryset_grade_avg = queryset.aggregate(Avg('grade'))
-        queryset_grade_sum = queryset.aggregate(Sum('grade'))
-        queryset_maxgrade_sum = queryset.aggregate(Sum('max_grade'))
-
-        course_queryset = StudentModule.objects.filter(
-            course_id__exact=course_key,
-            grade__isnull=False,
-            max_grade__isnull=False,
-            max_grade__gt=0
-        )
-        course_queryset_grade_avg = course_queryset.aggregate(Avg('grade'))
-        course_queryset_grade_sum = course_queryset.aggregate(Sum('grade'))
-        course_queryset_maxgrade_sum = course_queryset.aggregate(Sum('max_grade'))
+        filtered = bool(user_ids or content_id)
+        aggregates = queryset.aggregate(Avg('grade'), Sum('grade'), Sum('max_grade'))
+        if filtered:
+            course_queryset = StudentModule.objects.filter(
+                course_id__exact=course_key,
+                grade__isnull=False,
+                max_grade__isnull=False,
+                max_grade__gt=0
+            )
+            course_aggregates = course_queryset.aggregate(Avg('grade'), Sum('grade'), Sum('max_grade'))
+        else:
+            # Without filters the course-wide figures are the same as the queryset ones
+            course_aggregates = aggregates
 
         response_data = {}
         base_uri = generate_base_uri(request)
         response_data['uri'] = base_uri
-        response_data['average_grade'] = queryset_grade_avg['grade__avg']
-        response_data['points_scored'] = queryset_grade_sum['grade__sum']
-        response_data['points_possible'] = queryset_maxgrade_sum['max_grade__sum']
-        response_data['course_average_grade'] = course_queryset_grade_avg['grade__avg']
-        response_data['course_points_scored'] = course_queryset_grade_sum['grade__sum']
-        response_data['course_points_possible'] = course_queryset_maxgrade_sum['max_grade__sum']
-
-        response_data['grades'] = []
-        for row in queryset:
-            serializer = GradeSerializer(row)
-            response_data['grades'].append(serializer.data)  # pylint: disable=E1101
+        response_data['average_grade'] = aggregates['grade__avg']
+        response_data['points_scored'] = aggregates['grade__sum']
+        response_data['points_possible'] = aggregates['max_grade__sum']
+        response_data['course_average_grade'] = course_aggregates['grade__avg']
+        response_data['course_points_scored'] = course_aggregates['grade__sum']
+        response_data['course_points_possible'] = course_aggregates['max_grade__sum']
+
+        page_params = get_keyset_page_params(request, self.paginate_by, self.max_paginate_by)
+        if page_params is None:
+            return Response({}, status=status.HTTP_400_BAD_REQUEST)
+        after_id, page_size = page_params
+        if page_size:
+            grade_rows = queryset.filter(id__gt=after_id or 0).order_by('id').values_list('id', 'grade')
+            grade_rows = list(grade_rows[:page_size])
+            response_data['grades'] = [{'grade': grade} for grade_id, grade in grade_rows]
+            response_data['next'] = generate_next_page_uri(
+                request, page_size, [grade_id for grade_id, grade in grade_rows]
+            )
+        else:
+            response_data['grades'] = [{'grade': grade} for grade in queryset.values_list('grade', flat=True).iterator()]
         return Response(response_data, status=status.HTTP_200_OK)
 
 
@@ -1483,7 +1838,7 @@ class CoursesProjectList(SecureListAPIView):
 
     def get_queryset(self):
         course_id = self.kwargs['course_id']
-        course_descriptor, course_key, course_content = get_course(self.request, self.request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         return Project.objects.filter(course_id=course_key)
 
 
@@ -1500,7 +1855,7 @@ class CourseMetrics(SecureAPIView):
         """
         GET /api/courses/{course_id}/metrics/
         """
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         users_enrolled = CourseEnrollment.num_enrolled_in(course_key)
@@ -1535,23 +1890,46 @@ class CoursesLeadersList(SecureListAPIView):
         count = self.request.QUERY_PARAMS.get('count', 3)
         data = {}
         course_avg = 0
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
 
+        exclude_users = get_aggregate_exclusion_filter(course_key)
+        if not content_id:
+            # Course-wide figures are read from the materialized per-user score table
+            scores = CourseUserScore.objects.filter(course_id=unicode(course_key), user_is_active=True)
+            if user_id:
+                user_points = CourseUserScore.objects.filter(course_id=unicode(course_key), user__id=user_id)\
+                    .values_list('points_scored', flat=True)
+                user_points = user_points[0] if user_points else 0
+                # A range count on the (course_id, user_is_active, points_scored) index, less the few
+                # excluded users above the user, which are looked up by id rather than filtered out of the range
+                users_above = scores.filter(points_scored__gt=user_points)
+                data['position'] = users_above.count() - users_above.filter(user__in=exclude_users).count() + 1
+                data['points'] = user_points
+            scores = scores.exclude(user__in=exclude_users)
+
+            totals = scores.aggregate(points=Sum('points_scored'), users=Count('id'))
+            if totals['users']:
+                course_avg = round(totals['points'] / float(totals['users']), 1)
+            data['course_avg'] = course_avg
+            scores = scores.values('user__id', 'user__username', 'user__profile__title', 'user__profile__avatar_url',
+                                   'points_scored').order_by('-points_scored')[:count]
+            serializer = CourseScoreLeadersSerializer(scores, many=True)
+            data['leaders'] = serializer.data  # pylint: disable=E1101
+            return Response(data, status=status.HTTP_200_OK)
+
+        existing_content, content_key = get_course_child_descriptor(request.user, course_key, content_id)  # pylint: disable=W0612
+        if not existing_content:
+            return Response({}, status=status.HTTP_400_BAD_REQUEST)
         queryset = StudentModule.objects.filter(
             course_id__exact=course_key,
+            module_state_key=existing_content.location,
             grade__isnull=False,
             max_grade__isnull=False,
             max_grade__gt=0,
             student__is_active=True
-        ).exclude(student__in=_get_aggregate_exclusion_user_ids(course_key))
-
-        if content_id:
-            content_descriptor, content_key, existing_content = get_course_child(request, request.user, course_key, content_id)  # pylint: disable=W0612
-            if not existing_content:
-                return Response({}, status=status.HTTP_400_BAD_REQUEST)
-            queryset = queryset.filter(module_state_key=existing_content.location)
+        ).exclude(student__in=exclude_users)
 
         if user_id:
             user_points = StudentModule.objects.filter(course_id__exact=course_key,
@@ -1563,13 +1941,12 @@ class CoursesLeadersList(SecureListAPIView):
             data['points'] = user_points
 
         points = queryset.aggregate(total=Sum('grade'))
-        users = queryset.filter(student__is_active=True).aggregate(total=Count('student__id', distinct=True))
+        users = queryset.aggregate(total=Count('student__id', distinct=True))
         if users and users['total']:
             course_avg = round(points['total'] / float(users['total']), 1)
         data['course_avg'] = course_avg
-        queryset = queryset.filter(student__is_active=True).values('student__id', 'student__username',
-                                                                   'student__profile__title',
-                                                                   'student__profile__avatar_url')\
+        queryset = queryset.values('student__id', 'student__username', 'student__profile__title',
+                                   'student__profile__avatar_url')\
             .annotate(points_scored=Sum('grade')).order_by('-points_scored')[:count]
         serializer = CourseLeadersSerializer(queryset, many=True)
 
@@ -1601,34 +1978,32 @@ class CoursesCompletionsLeadersList(SecureAPIView):
         count = self.request.QUERY_PARAMS.get('count', 3)
         data = {}
         course_avg = 0
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
 
-        exclude_users = _get_aggregate_exclusion_user_ids(course_key)
-        queryset = CourseModuleCompletion.objects.filter(course_id=course_key)\
-            .exclude(user__in=exclude_users)
+        exclude_users = get_aggregate_exclusion_filter(course_key)
+        counters = CourseUserCompletionCount.objects.filter(course_id=unicode(course_key), completions__gt=0)
 
         if user_id:
-            user_completions = queryset.filter(user__id=user_id).count()
-            completions_above_user = queryset.filter(user__is_active=True).values('user__id')\
-                .annotate(completions=Count('content_id')).filter(completions__gt=user_completions).count()
-            data['position'] = completions_above_user + 1
+            user_completions = counters.filter(user__id=user_id).exclude(user__in=exclude_users)\
+                .values_list('completions', flat=True)
+            user_completions = user_completions[0] if user_completions else 0
+            # A range count on the (course_id, user_is_active, completions) index, less the few
+            # excluded users above the user, which are looked up by id rather than filtered out of the range
+            users_above = counters.filter(user_is_active=True, completions__gt=user_completions)
+            data['position'] = users_above.count() - users_above.filter(user__in=exclude_users).count() + 1
             data['completions'] = user_completions
 
-        total_completions = queryset.filter(user__is_active=True).count()
-        users = CourseModuleCompletion.objects.filter(user__is_active=True)\
-            .exclude(user__in=exclude_users)\
-            .aggregate(total=Count('user__id', distinct=True))
-
-        if users and users['total'] > 0:
-            course_avg = round(total_completions / float(users['total']), 1)
+        counters = counters.filter(user_is_active=True).exclude(user__in=exclude_users)
+        totals = counters.aggregate(completions=Sum('completions'), users=Count('id'))
+        if totals['users']:
+            course_avg = round(totals['completions'] / float(totals['users']), 1)
         data['course_avg'] = course_avg
 
-        queryset = queryset.filter(user__is_active=True).values('user__id', 'user__username', 'user__profile__title',
-                                                                'user__profile__avatar_url')\
-            .annotate(completions=Count('content_id')).order_by('-completions')[:count]
-        serializer = CourseCompletionsLeadersSerializer(queryset, many=True)
+        counters = counters.values('user__id', 'user__username', 'user__profile__title', 'user__profile__avatar_url',
+                                   'completions').order_by('-completions')[:count]
+        serializer = CourseCompletionsLeadersSerializer(counters, many=True)
         data['leaders'] = serializer.data  # pylint: disable=E1101
         return Response(data, status=status.HTTP_200_OK)
 
@@ -1645,7 +2020,7 @@ class CoursesWorkgroupsList(SecureListAPIView):
 
     def get_queryset(self):
         course_id = self.kwargs['course_id']
-        course_descriptor, course_key, course_content = get_course(self.request, self.request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             raise Http404
 
@@ -1671,7 +2046,7 @@ class CoursesSocialMetrics(SecureListAPIView):
 
             # remove any excluded users from the aggregate
 
-            exclude_users = _get_aggregate_exclusion_user_ids(course_key)
+            exclude_users = get_aggregate_exclusion_user_ids(course_key)
 
             for user_id in exclude_users:
                 if str(user_id) in data:
@@ -1703,11 +2078,11 @@ class CoursesCitiesMetrics(SecureListAPIView):
         course_id = self.kwargs['course_id']
         city = self.request.QUERY_PARAMS.get('city', None)
         upper_bound = getattr(settings, 'API_LOOKUP_UPPER_BOUND', 100)
-        course_descriptor, course_key, course_content = get_course(self.request, self.request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             raise Http404
 
-        exclude_users = _get_aggregate_exclusion_user_ids(course_key)
+        exclude_users = get_aggregate_exclusion_filter(course_key)
         queryset = CourseEnrollment.users_enrolled_in(course_key).exclude(id__in=exclude_users)
         if city:
             city = city.split(',')[:upper_bound]
@@ -1736,7 +2111,7 @@ class CoursesRolesList(SecureAPIView):
         GET /api/courses/{course_id}/roles/
         """
         course_id = self.kwargs['course_id']
-        course_descriptor, course_key, course_content = get_course(self.request, self.request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             raise Http404
 
@@ -1769,7 +2144,7 @@ class CoursesRolesList(SecureAPIView):
         POST /api/courses/{course_id}/roles/
         """
         course_id = self.kwargs['course_id']
-        course_descriptor, course_key, course_content = get_course(self.request, self.request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             raise Http404
 
@@ -1799,7 +2174,7 @@ class CoursesRolesUsersDetail(SecureAPIView):
         """
         DELETE /api/courses/{course_id}/roles/{role}/users/{user_id}
         """
-        course_descriptor, course_key, course_content = get_course(self.request, self.request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
 
@@ -1,34 +1,138 @@
 """ Centralized access to LMS courseware app """
+from datetime import datetime
+from pytz import UTC
 
-from courseware import courses, module_render
+from django.conf import settings
+from django.core.cache import cache
+
+from courseware import courses, grades, module_render
+from courseware.access import has_access
 from courseware.model_data import FieldDataCache
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey, UsageKey
 from opaque_keys.edx.locations import SlashSeparatedCourseKey, Location
+from student.models import CourseAccessRole
+from student.roles import CourseObserverRole
 from xmodule.modulestore import InvalidLocationError
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.exceptions import ItemNotFoundError
 
+from api_manager.models import aggregate_exclusion_cache_key, get_course_cache_generation, \
+    get_course_cache_generations
+from api_manager.utils import get_chunked_cache_value, set_chunked_cache_value, TimedLRUCache
 
-def get_course(request, user, course_id, depth=0):
+COURSE_DESCRIPTOR_CACHE = TimedLRUCache(
+    max_size=getattr(settings, 'API_COURSE_CACHE_SIZE', 100),
+    timeout=getattr(settings, 'API_COURSE_CACHE_TIMEOUT', 300)
+)
+KEY_PARSE_CACHE = TimedLRUCache(max_size=getattr(settings, 'API_KEY_PARSE_CACHE_SIZE', 10000))
+INVALID_KEY = object()  # Memoized marker for identifiers which failed to parse
+
+
+def get_course_cache_stats():
     """
-    Utility method to obtain course components
+    Return the size and hit/miss counters of the course descriptor cache
+    """
+    return COURSE_DESCRIPTOR_CACHE.stats()
+
+
+def _load_course_descriptor(course_key, depth=0, use_cache=True, generation=None):
+    """
+    Load a course descriptor, serving it from the process-wide cache when possible.
+    Cached descriptors are shared between requests and must be treated as read-only
+    """
+    if not use_cache:
+        return courses.get_course(course_key, depth)
+    cache_key = (unicode(course_key), depth)
+    if generation is None:
+        generation = get_course_cache_generation(course_key)
+    cached = COURSE_DESCRIPTOR_CACHE.get(cache_key)
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+    course_descriptor = courses.get_course(course_key, depth)
+    COURSE_DESCRIPTOR_CACHE.set(cache_key, (generation, course_descriptor))
+    return course_descriptor
+
+
+def _parse_course_key(course_id):
+    """
+    Convert a course identifier into a CourseKey, returning None if it is invalid
     """
-    course_descriptor = None
-    course_key = None
-    course_content = None
     try:
-        course_key = CourseKey.from_string(course_id)
+        return CourseKey.from_string(course_id)
     except InvalidKeyError:
         try:
-            course_key = SlashSeparatedCourseKey.from_deprecated_string(course_id)
+            return SlashSeparatedCourseKey.from_deprecated_string(course_id)
         except InvalidKeyError:
-            pass
+            return None
+
+
+def _parse_usage_key(content_id):
+    """
+    Convert a content identifier into a UsageKey, returning None if it is invalid
+    """
+    try:
+        return UsageKey.from_string(content_id)
+    except InvalidKeyError:
+        try:
+            return Location.from_deprecated_string(content_id)
+        except (InvalidLocationError, InvalidKeyError):
+            return None
+
+
+def _get_memoized_key(kind, identifier, parser):
+    """
+    Return the parsed key for identifier, remembering both successes and failures
+    """
+    memo_key = (kind, identifier)
+    parsed_key = KEY_PARSE_CACHE.get(memo_key)
+    if parsed_key is None:
+        parsed_key = parser(identifier)
+        KEY_PARSE_CACHE.set(memo_key, parsed_key if parsed_key is not None else INVALID_KEY)
+    elif parsed_key is INVALID_KEY:
+        parsed_key = None
+    return parsed_key
+
+
+def get_course_key(course_id):
+    """
+    Parse a course identifier (new-style or deprecated) into a CourseKey,
+    returning None if it is invalid
+    """
+    return _get_memoized_key('course', course_id, _parse_course_key)
+
+
+def get_usage_key(content_id):
+    """
+    Parse a content identifier (new-style or deprecated) into a UsageKey,
+    returning None if it is invalid
+    """
+    return _get_memoized_key('usage', content_id, _parse_usage_key)
+
+
+def get_course_descriptor(course_id, depth=0, use_cache=True):
+    """
+    Lightweight lookup returning only the course descriptor and key, without
+    binding a module (and loading student state) for the requesting user
+    """
+    course_descriptor = None
+    course_key = get_course_key(course_id)
     if course_key:
         try:
-            course_descriptor = courses.get_course(course_key, depth)
+            course_descriptor = _load_course_descriptor(course_key, depth, use_cache)
         except ValueError:
             pass
+    return course_descriptor, course_key
+
+
+def get_course(request, user, course_id, depth=0):
+    """
+    Utility method to obtain course components
+    The descriptor is bound to the user, so it is always loaded afresh rather than
+    taken from the shared descriptor cache
+    """
+    course_content = None
+    course_descriptor, course_key = get_course_descriptor(course_id, depth, use_cache=False)
     if course_descriptor:
         field_data_cache = FieldDataCache([course_descriptor], course_key, user)
         course_content = module_render.get_module(
@@ -40,43 +144,233 @@ def get_course(request, user, course_id, depth=0):
     return course_descriptor, course_key, course_content
 
 
-def get_course_child(request, user, course_key, content_id):
+def get_course_child_descriptor(user, course_key, content_id):
     """
-    Return a course xmodule/xblock to the caller
+    Lightweight lookup returning only the content descriptor and key, without
+    binding a module for the requesting user. As with get_module, content the
+    user may not load (staff-only or not yet released) is treated as missing
     """
     content_descriptor = None
-    content_key = None
-    content = None
-    try:
-        content_key = UsageKey.from_string(content_id)
-    except InvalidKeyError:
-        try:
-            content_key = Location.from_deprecated_string(content_id)
-        except (InvalidLocationError, InvalidKeyError):
-            pass
+    content_key = get_usage_key(content_id)
     if content_key:
         try:
             content_descriptor = modulestore().get_item(content_key)
         except ItemNotFoundError:
             pass
-        if content_descriptor:
-            field_data_cache = FieldDataCache([content_descriptor], course_key, user)
-            content = module_render.get_module(
-                user,
-                request,
-                content_key,
-                field_data_cache,
-                course_key)
+        if content_descriptor and not has_access(user, 'load', content_descriptor, course_key):
+            content_descriptor = None
+    return content_descriptor, content_key
+
+
+def get_accessible_children(user, course_key, descriptors):
+    """
+    Filter a list of content descriptors down to those the user may load
+    """
+    return [descriptor for descriptor in descriptors if has_access(user, 'load', descriptor, course_key)]
+
+
+def get_course_child(request, user, course_key, content_id):
+    """
+    Return a course xmodule/xblock to the caller
+    """
+    content = None
+    content_descriptor, content_key = get_course_child_descriptor(user, course_key, content_id)
+    if content_descriptor:
+        field_data_cache = FieldDataCache([content_descriptor], course_key, user)
+        content = module_render.get_module(
+            user,
+            request,
+            content_key,
+            field_data_cache,
+            course_key)
     return content_descriptor, content_key, content
 
 
-def get_course_total_score(course_summary):
+def get_course_summaries(course_keys):
+    """
+    Return a dict of course key -> summary (id, name, start, end) for the specified
+    courses, without binding any modules. Summaries are kept in the shared cache
+    (see API_COURSE_SUMMARY_CACHE_TIMEOUT) so that repeated requests only cost a
+    couple of cache round trips; courses which no longer exist are left out
+    """
+    summary_timeout = getattr(settings, 'API_COURSE_SUMMARY_CACHE_TIMEOUT', 3600)
+    generations = get_course_cache_generations(course_keys)
+    summary_keys = {}
+    for course_key in course_keys:
+        summary_key = 'api_manager.course_summary.{}.{}'.format(unicode(course_key), generations[course_key])
+        summary_keys[summary_key] = course_key
+    summaries = {}
+    if summary_timeout:
+        for summary_key, summary in cache.get_many(summary_keys.keys()).iteritems():
+            summaries[summary_keys[summary_key]] = summary
+    new_summaries = {}
+    for summary_key, course_key in summary_keys.iteritems():
+        if course_key in summaries:
+            continue
+        try:
+            course_descriptor = _load_course_descriptor(course_key, generation=generations[course_key])
+        except ValueError:
+            continue
+        summary = {
+            'id': unicode(course_key),
+            'name': course_descriptor.display_name,
+            'start': getattr(course_descriptor, 'start', None),
+            'end': getattr(course_descriptor, 'end', None),
+        }
+        summaries[course_key] = summary
+        new_summaries[summary_key] = summary
+    if summary_timeout and new_summaries:
+        cache.set_many(new_summaries, summary_timeout)
+    return summaries
+
+
+def _build_course_outline(course_key, course_descriptor):
+    """
+    Walk the course tree once, flattening it into a dict of serializable nodes
+    keyed by content identifier. Each node keeps the ordered ids of its children
+    and the id of its parent; a category index lists node ids in course order.
+    Nodes which were staff-only or not yet released when the index was built are
+    marked restricted, so that readers check access to them on the descriptor
+    """
+    now = datetime.now(UTC)
+    root_id = unicode(course_key)
+    nodes = {}
+    categories = {}
+    pending = [(course_descriptor, None)]
+    while pending:
+        descriptor, parent_id = pending.pop()
+        node_id = root_id if parent_id is None else unicode(descriptor.scope_ids.usage_id)
+        data = {
+            'id': node_id,
+            'category': descriptor.location.category,
+            'start': getattr(descriptor, 'start', None),
+            'end': getattr(descriptor, 'end', None),
+        }
+        if hasattr(descriptor, 'display_name'):
+            data['name'] = descriptor.display_name
+        if hasattr(descriptor, 'due'):
+            data['due'] = descriptor.due
+        if parent_id is None:
+            data['number'] = descriptor.location.course
+            data['org'] = descriptor.location.org
+        children = descriptor.get_children() if hasattr(descriptor, 'children') else []
+        start = data['start']
+        nodes[node_id] = {
+            'data': data,
+            'parent': parent_id,
+            'children': [unicode(child.scope_ids.usage_id) for child in children],
+            'restricted': getattr(descriptor, 'visible_to_staff_only', False) or (start is not None and start > now),
+        }
+        categories.setdefault(data['category'], []).append(node_id)
+        # Children are pushed in reverse so that nodes are visited in course order
+        pending.extend((child, node_id) for child in reversed(children))
+    return {'root': root_id, 'nodes': nodes, 'categories': categories}
+
+
+def get_course_outline(course_key):
     """
-    Traverse course summary to calculate max possible score for a course
+    Return the outline index of a course (see _build_course_outline), or None if
+    the course does not exist. The index is built once per published version of
+    the course and shared between processes through the cache
     """
-    score = 0
-    for chapter in course_summary:  # accumulate score of each chapter
+    generation = get_course_cache_generation(course_key)
+    outline_key = 'api_manager.course_outline_chunks.{}.{}'.format(unicode(course_key), generation)
+    outline = get_chunked_cache_value(outline_key)
+    if outline is None:
+        try:
+            # Load the whole tree in one pass; it is only needed while building the index
+            course_descriptor = _load_course_descriptor(course_key, depth=None, use_cache=False)
+        except ValueError:
+            return None
+        outline = _build_course_outline(course_key, course_descriptor)
+        set_chunked_cache_value(outline_key, outline, getattr(settings, 'API_COURSE_OUTLINE_CACHE_TIMEOUT', 86400))
+    return outline
+
+
+def get_course_outline_descendants(outline, node_id, category=None):
+    """
+    Return the ids of all descendants of an outline node in course order,
+    optionally limited to a single category
+    """
+    nodes = outline['nodes']
+    descendants = []
+    if category is not None:
+        for candidate_id in outline['categories'].get(category, []):
+            parent_id = nodes[candidate_id]['parent']
+            while parent_id is not None and parent_id != node_id:
+                parent_id = nodes[parent_id]['parent']
+            if parent_id is not None:
+                descendants.append(candidate_id)
+        return descendants
+    pending = list(reversed(nodes[node_id]['children']))
+    while pending:
+        child_id = pending.pop()
+        descendants.append(child_id)
+        pending.extend(reversed(nodes[child_id]['children']))
+    return descendants
+
+
+def get_accessible_outline_nodes(user, course_key, outline, node_ids):
+    """
+    Filter outline node ids down to those the user may load. Unrestricted nodes can be
+    loaded by anyone; restricted ones are checked with has_access on their descriptors
+    """
+    accessible = []
+    for node_id in node_ids:
+        if outline['nodes'][node_id].get('restricted', True):
+            content_descriptor, content_key = get_course_child_descriptor(user, course_key, node_id)  # pylint: disable=W0612
+            if content_descriptor is None:
+                continue
+        accessible.append(node_id)
+    return accessible
+
+
+def get_course_progress(student, request, course_descriptor):
+    """
+    Returns the progress summary of the student in the course along with the course total score,
+    the sum of the possible points of the sections in the summary
+    """
+    courseware_summary = grades.progress_summary(student, request, course_descriptor)
+    total_score = 0
+    for chapter in courseware_summary or []:
         for section in chapter['sections']:
             if section['section_total']:
-                score += section['section_total'][1]
-    return score
+                total_score += section['section_total'][1]
+    return courseware_summary, total_score
+
+
+def _aggregate_exclusion_queryset(course_key):
+    """
+    Returns a query of the ids of the users holding one of the AGGREGATION_EXCLUDE_ROLES roles in the course
+    """
+    exclude_role_list = getattr(settings, 'AGGREGATION_EXCLUDE_ROLES', [CourseObserverRole.ROLE])
+    return CourseAccessRole.objects.filter(
+        course_id=course_key,
+        org=course_key.org,
+        role__in=exclude_role_list
+    ).values_list('user', flat=True)
+
+
+def get_aggregate_exclusion_user_ids(course_key):
+    """
+    Returns the set of ids of the users that are marked in roles that can be excluded from
+    certain aggregate queries. The list of roles to exclude can be defined in a
+    AGGREGATION_EXCLUDE_ROLES settings variable. The set is cached per course until a role changes
+    """
+    cache_key = aggregate_exclusion_cache_key(course_key)
+    exclude_user_ids = cache.get(cache_key)
+    if exclude_user_ids is None:
+        exclude_user_ids = set(_aggregate_exclusion_queryset(course_key))
+        cache.set(cache_key, exclude_user_ids, getattr(settings, 'API_AGGREGATE_EXCLUSION_CACHE_TIMEOUT', 3600))
+    return exclude_user_ids
+
+
+def get_aggregate_exclusion_filter(course_key):
+    """
+    Returns the value to exclude users with in a `__in` lookup: the cached set of ids,
+    or a subquery when the set is too large to be sent as a literal list
+    """
+    exclude_user_ids = get_aggregate_exclusion_user_ids(course_key)
+    if len(exclude_user_ids) > getattr(settings, 'API_AGGREGATE_EXCLUSION_SUBQUERY_THRESHOLD', 100):
+        return _aggregate_exclusion_queryset(course_key)
+    return exclude_user_ids
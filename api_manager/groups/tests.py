@@ -8,13 +8,17 @@ from datetime import datetime
 from random import randint
 import uuid
 import json
+import mock
 from urllib import urlencode
 
+from django.contrib.auth.models import Group, User
 from django.core.cache import cache
 from django.test import TestCase, Client
 from django.test.utils import override_settings
 
-from api_manager.models import GroupRelationship, GroupProfile, Organization
+from api_manager.groups.views import GroupsList
+from api_manager.models import GroupRelationship, GroupRelationshipCycleError, GroupProfile, GroupProfileData, \
+    Organization
 from projects.models import Project
 from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
@@ -176,6 +180,112 @@ class GroupsApiTests(TestCase):
         response_profile_data = response.data[0]['data']
         self.assertEqual(response_profile_data['display_name'], 'My updated series')
 
+    def test_group_list_get_filter_by_data(self):
+        group_ids = []
+        for display_name in ('First series', 'Second series'):
+            data = {
+                'name': self.test_group_name,
+                'type': 'series',
+                'data': {'display_name': display_name, 'rank': 1}
+            }
+            response = self.do_post(self.base_groups_uri, data)
+            self.assertEqual(response.status_code, 201)
+            group_ids.append(response.data['id'])
+
+        test_uri = '{}?type=series&{}'.format(self.base_groups_uri, urlencode({'data__display_name': 'First series'}))
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['id'], group_ids[0])
+        self.assertEqual(response.data[0]['data']['rank'], 1)
+
+        test_uri = '{}?type=series&data__rank=1'.format(self.base_groups_uri)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+        # updating the profile re-syncs the indexed data
+        data = {
+            'name': self.test_group_name,
+            'type': 'series',
+            'data': {'display_name': 'Renamed series'}
+        }
+        response = self.do_post('{}/{}'.format(self.base_groups_uri, group_ids[0]), data)
+        self.assertEqual(response.status_code, 200)
+        test_uri = '{}?type=series&{}'.format(self.base_groups_uri, urlencode({'data__display_name': 'First series'}))
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 0)
+        test_uri = '{}?type=series&{}'.format(self.base_groups_uri, urlencode({'data__display_name': 'Renamed series'}))
+        response = self.do_get(test_uri)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['id'], group_ids[0])
+        self.assertEqual(response.data[0]['data'], {'display_name': 'Renamed series'})
+
+    def test_group_list_get_paged_and_filtered(self):
+        group_ids = []
+        for name in ('Alpha One', 'Alpha Two', 'Beta One'):
+            response = self.do_post(self.base_groups_uri, {'name': name, 'type': 'workgroup'})
+            self.assertEqual(response.status_code, 201)
+            group_ids.append(response.data['id'])
+
+        test_uri = '{}?type=workgroup&page_size=2'.format(self.base_groups_uri)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([group['id'] for group in response.data['results']], group_ids[:2])
+        self.assertIn('after_id={}'.format(group_ids[1]), response.data['next'])
+        response = self.do_get(response.data['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([group['id'] for group in response.data['results']], group_ids[2:])
+        self.assertIsNone(response.data['next'])
+
+        # the page size is capped by the view's max_paginate_by
+        with mock.patch.object(GroupsList, 'max_paginate_by', 1):
+            response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([group['id'] for group in response.data['results']], group_ids[:1])
+        self.assertIn('after_id={}'.format(group_ids[0]), response.data['next'])
+
+        test_uri = '{}?type=workgroup&name__startswith=Alpha'.format(self.base_groups_uri)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([group['id'] for group in response.data], group_ids[:2])
+
+        test_uri = '{}?type=workgroup&ids={},{}'.format(self.base_groups_uri, group_ids[0], group_ids[2])
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(group['id'] for group in response.data), [group_ids[0], group_ids[2]])
+
+        test_uri = '{}?type=workgroup&ids=1,abc'.format(self.base_groups_uri)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 400)
+        test_uri = '{}?type=workgroup&after_id=abc'.format(self.base_groups_uri)
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 400)
+
+    def test_group_profile_data_sync(self):
+        group = Group.objects.create(name=str(uuid.uuid4()))
+        with mock.patch.object(GroupProfileData, 'sync') as mock_sync:
+            profile = GroupProfile.objects.create(group=group, group_type='series', name='Empty series')
+            self.assertFalse(mock_sync.called)
+
+            # saves which leave the data alone don't re-sync it
+            profile = GroupProfile.objects.get(id=profile.id)
+            profile.name = 'Renamed series'
+            profile.save()
+            self.assertFalse(mock_sync.called)
+
+        profile.data = json.dumps({'display_name': 'My series'})
+        profile.save()
+        self.assertEqual(
+            list(GroupProfileData.objects.filter(group_profile=profile).values_list('key', 'value')),
+            [('display_name', 'My series')]
+        )
+
+        # callers get their own copy of the memoized data
+        profile.get_data()['display_name'] = 'Changed by a caller'
+        self.assertEqual(profile.get_data(), {'display_name': 'My series'})
+
     def test_group_list_post_invalid_name(self):
         data = {'name': '', 'type': 'test'}
         response = self.do_post(self.base_groups_uri, data)
@@ -679,6 +789,122 @@ class GroupsApiTests(TestCase):
             self.assertGreater(len(relationship['uri']), 0)
         self.assertEqual(relationship_count, len(group_idlist))
 
+    def test_group_groups_list_get_hierarchy(self):
+        group_ids = {}
+        for name in ('Alpha', 'Beta', 'Gamma', 'Delta'):
+            response = self.do_post(self.base_groups_uri, {'name': name, 'type': 'test'})
+            self.assertEqual(response.status_code, 201)
+            group_ids[name] = response.data['id']
+        for parent, child in (('Alpha', 'Beta'), ('Beta', 'Gamma')):
+            test_uri = '{}/{}/groups'.format(self.base_groups_uri, group_ids[parent])
+            response = self.do_post(test_uri, {'group_id': group_ids[child], 'relationship_type': 'h'})
+            self.assertEqual(response.status_code, 201)
+
+        alpha_uri = '{}/{}/groups'.format(self.base_groups_uri, group_ids['Alpha'])
+        response = self.do_get(alpha_uri)
+        self.assertEqual([group['id'] for group in response.data], [group_ids['Beta']])
+        response = self.do_get(alpha_uri + '?descendants=true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(group['id'], group['depth']) for group in response.data],
+            [(group_ids['Beta'], 1), (group_ids['Gamma'], 2)]
+        )
+        response = self.do_get(alpha_uri + '?descendants=true&depth=1')
+        self.assertEqual([group['id'] for group in response.data], [group_ids['Beta']])
+        gamma_uri = '{}/{}/groups'.format(self.base_groups_uri, group_ids['Gamma'])
+        response = self.do_get(gamma_uri + '?ancestors=true')
+        self.assertEqual(
+            [(group['id'], group['depth']) for group in response.data],
+            [(group_ids['Beta'], 1), (group_ids['Alpha'], 2)]
+        )
+        beta_uri = '{}/{}/groups'.format(self.base_groups_uri, group_ids['Beta'])
+        response = self.do_get(beta_uri + '?descendants=true&ancestors=true')
+        self.assertEqual(
+            [(group['id'], group['direction'], group['depth']) for group in response.data],
+            [(group_ids['Gamma'], 'descendant', 1), (group_ids['Alpha'], 'ancestor', 1)]
+        )
+
+        # a group cannot be placed below its own descendant
+        response = self.do_post(gamma_uri, {'group_id': group_ids['Alpha'], 'relationship_type': 'h'})
+        self.assertEqual(response.status_code, 406)
+        alpha = GroupRelationship.objects.get(group=group_ids['Alpha'])
+        alpha.parent_group = GroupRelationship.objects.get(group=group_ids['Gamma'])
+        with self.assertRaises(GroupRelationshipCycleError):
+            alpha.save()
+        self.assertIsNone(GroupRelationship.objects.get(group=group_ids['Alpha']).parent_group_id)
+
+        # moving a subtree moves the ancestry of all of its groups
+        delta_uri = '{}/{}/groups'.format(self.base_groups_uri, group_ids['Delta'])
+        response = self.do_post(delta_uri, {'group_id': group_ids['Beta'], 'relationship_type': 'h'})
+        self.assertEqual(response.status_code, 201)
+        response = self.do_get(gamma_uri + '?ancestors=true')
+        self.assertEqual([group['id'] for group in response.data], [group_ids['Beta'], group_ids['Delta']])
+        response = self.do_get(alpha_uri + '?descendants=true')
+        self.assertEqual(len(response.data), 0)
+
+        # members of the whole subtree
+        delta_member = User.objects.create(username=str(uuid.uuid4()), email='{}@test.org'.format(uuid.uuid4()))
+        gamma_member = User.objects.create(username=str(uuid.uuid4()), email='{}@test.org'.format(uuid.uuid4()))
+        delta_member.groups.add(group_ids['Delta'])
+        gamma_member.groups.add(group_ids['Gamma'])
+        delta_users_uri = '{}/{}/users'.format(self.base_groups_uri, group_ids['Delta'])
+        response = self.do_get(delta_users_uri)
+        self.assertEqual([user['id'] for user in response.data['users']], [delta_member.id])
+        response = self.do_get(delta_users_uri + '?descendants=true')
+        self.assertEqual(sorted(user['id'] for user in response.data['users']), [delta_member.id, gamma_member.id])
+        response = self.do_get(delta_users_uri + '?descendants=true&depth=1')
+        self.assertEqual([user['id'] for user in response.data['users']], [delta_member.id])
+
+    def test_group_groups_list_post_linked_bulk(self):
+        group_ids = []
+        for name in ('Alpha Group', 'Beta Group', 'Delta Group', 'Gamma Group'):
+            response = self.do_post(self.base_groups_uri, {'name': name, 'type': 'test'})
+            self.assertEqual(response.status_code, 201)
+            group_ids.append(response.data['id'])
+        alpha_id, linked_ids = group_ids[0], group_ids[1:]
+        test_uri = '{}/{}/groups'.format(self.base_groups_uri, alpha_id)
+
+        response = self.do_post(test_uri, {'group_ids': linked_ids, 'relationship_type': 'g'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['group_id'] for item in response.data], [str(group_id) for group_id in linked_ids])
+        # linking again doesn't duplicate the relationships
+        response = self.do_post(test_uri, {'group_ids': linked_ids, 'relationship_type': 'g'})
+        self.assertEqual(response.status_code, 201)
+        response = self.do_get(test_uri)
+        self.assertEqual(sorted(group['id'] for group in response.data), linked_ids)
+        for linked_id in linked_ids:
+            response = self.do_get('{}/{}'.format(test_uri, linked_id))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['relationship_type'], 'g')
+            response = self.do_get('{}/{}/groups/{}'.format(self.base_groups_uri, linked_id, alpha_id))
+            self.assertEqual(response.status_code, 200)
+
+        response = self.do_delete('{}?group_ids={},{}'.format(test_uri, linked_ids[0], linked_ids[1]))
+        self.assertEqual(response.status_code, 204)
+        response = self.do_get('{}/{}'.format(test_uri, linked_ids[0]))
+        self.assertEqual(response.status_code, 404)
+        response = self.do_get('{}/{}/groups/{}'.format(self.base_groups_uri, linked_ids[1], alpha_id))
+        self.assertEqual(response.status_code, 404)
+        response = self.do_get(test_uri)
+        self.assertEqual([group['id'] for group in response.data], [linked_ids[2]])
+
+        response = self.do_post(test_uri, {'group_ids': [linked_ids[0], 123456789], 'relationship_type': 'g'})
+        self.assertEqual(response.status_code, 404)
+        response = self.do_post(test_uri, {'group_ids': linked_ids, 'relationship_type': 'h'})
+        self.assertEqual(response.status_code, 406)
+        response = self.do_delete('{}?group_ids=abc'.format(test_uri))
+        self.assertEqual(response.status_code, 400)
+
+        # form-encoded requests pass one group_ids field per group
+        headers = {'X-Edx-Api-Key': str(TEST_API_KEY)}
+        response = self.client.post(
+            test_uri, headers=headers, data={'group_ids': linked_ids[:2], 'relationship_type': 'g'}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['group_id'] for item in response.data], [str(group_id) for group_id in linked_ids[:2]])
+        response = self.do_get(test_uri)
+        self.assertEqual(sorted(group['id'] for group in response.data), linked_ids)
+
     def test_group_groups_list_get_notfound(self):
         test_uri = self.base_groups_uri + '/213213123/groups'
         response = self.do_get(test_uri)
@@ -2,17 +2,19 @@
 import uuid
 import json
 
+from django.conf import settings
 from django.contrib.auth.models import Group
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import Http404
+from django.http import Http404, QueryDict
 
 from rest_framework import status
 from rest_framework.response import Response
 
-from api_manager.courseware_access import get_course
-from api_manager.models import GroupRelationship, CourseGroupRelationship, GroupProfile, APIUser as User
-from api_manager.permissions import SecureAPIView, SecureListAPIView
-from api_manager.utils import str2bool, generate_base_uri
+from api_manager.courseware_access import get_course_descriptor
+from api_manager.models import GroupRelationship, GroupRelationshipClosure, GroupRelationshipCycleError, \
+    CourseGroupRelationship, GroupProfile, APIUser as User
+from api_manager.permissions import PaginationMixin, SecureAPIView, SecureListAPIView
+from api_manager.utils import str2bool, generate_base_uri, generate_next_page_uri, get_keyset_page_params, is_int
 from api_manager.organizations import serializers
 from projects.serializers import BasicWorkgroupSerializer
 
@@ -20,11 +22,13 @@ from projects.serializers import BasicWorkgroupSerializer
 RELATIONSHIP_TYPES = {'hierarchical': 'h', 'graph': 'g'}
 
 
-class GroupsList(SecureAPIView):
+class GroupsList(PaginationMixin, SecureAPIView):
     """
     ### The GroupsList view allows clients to retrieve/append a list of Group entities
     - URI: ```/api/groups/```
-    - GET: Returns a JSON representation (array) of the set of Group entities
+    - GET: Returns a JSON representation (array) of the set of Group entities; when page_size or after_id
+      is passed, a JSON object holding the page of Group entities in 'results' and the uri of the next page
+      (null on the last page) in 'next'
         * type: __required__, Set filtering parameter
     - POST: Provides the ability to append to the Group entity set
         * name: The name of the group being added
@@ -44,6 +48,12 @@ class GroupsList(SecureAPIView):
     ### Use Cases/Notes:
     * GET requests for _all_ groups are not currently allowed via the API
     * If no 'type' parameter is specified during GET, the server will return a 400 Bad Request
+    * GET results can be filtered by name prefix (?name__startswith=Alpha) and by group ids (?ids=1,2,3)
+    * To page through a large set of groups, pass page_size and/or after_id (the last group id of the previous page),
+      e.g. ?type=workgroup&page_size=100, then follow the 'next' uri (?type=workgroup&page_size=100&after_id=4567).
+      page_size defaults to API_PAGE_SIZE and is capped at 100
+    * GET results can be filtered by top-level 'data' values, e.g. ?type=series&data__display_name=Demo%20Program
+      (non-string values are matched by their JSON text, e.g. data__active=true)
     * 'type' is a free-form field used to tag/filter group entities.
     * Some sample of types include:
         ** workgroup: a group of users working on a project together
@@ -99,7 +109,29 @@ class GroupsList(SecureAPIView):
         group_type = request.QUERY_PARAMS.get('type', None)
         if group_type is None:
             return Response({}, status=status.HTTP_400_BAD_REQUEST)
-        profiles = GroupProfile.objects.filter(group_type=request.GET['type']).select_related('group')
+        profiles = GroupProfile.objects.filter(group_type=group_type).select_related('group')
+        name_prefix = request.QUERY_PARAMS.get('name__startswith', None)
+        if name_prefix:
+            profiles = profiles.filter(name__startswith=name_prefix)
+        group_ids = request.QUERY_PARAMS.get('ids', None)
+        if group_ids:
+            upper_bound = getattr(settings, 'API_LOOKUP_UPPER_BOUND', 100)
+            group_ids = [group_id for group_id in group_ids.split(',') if group_id][:upper_bound]
+            if not all(is_int(group_id) for group_id in group_ids):
+                return Response({}, status=status.HTTP_400_BAD_REQUEST)
+            profiles = profiles.filter(group__in=group_ids)
+        for param, value in request.QUERY_PARAMS.iteritems():
+            if param.startswith('data__') and len(param) > len('data__'):
+                profiles = profiles.filter(data_items__key=param[len('data__'):], data_items__value=value)
+
+        page_params = get_keyset_page_params(request, self.paginate_by, self.max_paginate_by)
+        if page_params is None:
+            return Response({}, status=status.HTTP_400_BAD_REQUEST)
+        after_id, page_size = page_params
+        if page_size:
+            profiles = profiles.filter(group__gt=after_id or 0).order_by('group')[:page_size]
+
+        base_uri = generate_base_uri(request, True)
         for profile in profiles:
             item_data = {}
             item_data['id'] = profile.group_id
@@ -110,9 +142,14 @@ class GroupsList(SecureAPIView):
             item_data['name'] = group_name
             item_data['type'] = profile.group_type
             if profile.data:
-                item_data['data'] = json.loads(profile.data)
-            item_data['uri'] = '{}/{}'.format(generate_base_uri(request, True), profile.group_id)
+                item_data['data'] = profile.get_data()
+            item_data['uri'] = '{}/{}'.format(base_uri, profile.group_id)
             response_data.append(item_data)
+        if page_size:
+            response_data = {
+                'next': generate_next_page_uri(request, page_size, [group_data['id'] for group_data in response_data]),
+                'results': response_data
+            }
         return Response(response_data, status=status.HTTP_200_OK)
 
 
@@ -197,9 +234,8 @@ class GroupsDetail(SecureAPIView):
                 response_data['name'] = existing_group.name
             if group_profile.group_type:
                 response_data['type'] = group_profile.group_type
-            data = group_profile.data
-            if data:
-                response_data['data'] = json.loads(data)
+            if group_profile.data:
+                response_data['data'] = group_profile.get_data()
         else:
             response_data['name'] = existing_group.name
         return Response(response_data, status=status.HTTP_200_OK)
@@ -219,6 +255,7 @@ class GroupsUsersList(SecureAPIView):
             }
     ### Use Cases/Notes:
     * Use the GroupsUsersList view to manage User membership for a specific Group
+    * Pass ?descendants=true to GET the members of the group and of every group below it (?depth=N limits the levels)
     * For example, as a newly-added member of a 'workgroup' group, a User could be presented with a list of their peers
     * Once a User Group exists, you can additionally link to Courses and other Groups (see GroupsCoursesList, GroupsGroupsList)
     """
@@ -262,7 +299,16 @@ class GroupsUsersList(SecureAPIView):
             existing_group = Group.objects.get(id=group_id)
         except ObjectDoesNotExist:
             return Response({}, status.HTTP_404_NOT_FOUND)
-        users = existing_group.user_set.all()
+        if str2bool(request.QUERY_PARAMS.get('descendants', 'false')):
+            depth = request.QUERY_PARAMS.get('depth', None)
+            if depth is not None and not is_int(depth):
+                return Response({}, status.HTTP_400_BAD_REQUEST)
+            subtree = GroupRelationshipClosure.objects.filter(ancestor=existing_group.id)
+            if depth is not None:
+                subtree = subtree.filter(depth__lte=int(depth))
+            users = User.objects.filter(groups__in=subtree.values('descendant')).distinct()
+        else:
+            users = existing_group.user_set.all()
 
         is_active = request.QUERY_PARAMS.get('is_active', None)
         if is_active:
@@ -343,6 +389,13 @@ class GroupsGroupsList(SecureAPIView):
                 "group_id" : 1234,
                 "relationship_type" : "g"
             }
+    - POST a list of group_ids to create graph relationships with many Groups at once:
+
+            {
+                "group_ids" : [1234, 1235, 1236],
+                "relationship_type" : "g"
+            }
+    - DELETE: Removes the graph relationships with the Groups listed in ?group_ids=1234,1235,1236
     ### Use Cases/Notes:
     * Use a graph-type relationship when you simply want to indicate a link between two groups:
         ** Linking a course series with a particular company
@@ -356,6 +409,13 @@ class GroupsGroupsList(SecureAPIView):
         ** POST /groups/987/groups {"group_id": 246}
         ** GET /groups/123/groups/246 -> 404 NOT FOUND
         ** GET /groups/987/groups/246 -> 200 OK
+    * A group cannot be made a child of one of its own descendants (406 NOT ACCEPTABLE)
+    * By default GET returns the direct children of the group; to return a whole hierarchy in a single request use:
+        ** ?descendants=true, every group below the specified group
+        ** ?ancestors=true, every group above the specified group
+        ** ?depth=2, together with either of the above, limits the number of levels returned
+      Hierarchical entries then include their 'depth' relative to the specified group and their 'direction'
+      ('descendant' or 'ancestor'), which tells the two lists apart when both are requested
     * Once a Group Group exists, you can additionally link to Users and Courses (see GroupsUsersList, GroupsCoursesList)
     """
 
@@ -363,6 +423,8 @@ class GroupsGroupsList(SecureAPIView):
         """
         POST /api/groups/{group_id}/groups/{related_group_id}
         """
+        if 'group_ids' in request.DATA:
+            return self._post_linked_groups(request, group_id)
         response_data = {}
         to_group_id = request.DATA['group_id']
         relationship_type = request.DATA['relationship_type']
@@ -380,7 +442,12 @@ class GroupsGroupsList(SecureAPIView):
             response_status = status.HTTP_201_CREATED
             if relationship_type == RELATIONSHIP_TYPES['hierarchical']:
                 to_group_relationship.parent_group = from_group_relationship
-                to_group_relationship.save()
+                try:
+                    to_group_relationship.save()
+                except GroupRelationshipCycleError:
+                    response_data['message'] = "Group '%s' cannot be a child of its own descendant" % to_group_id
+                    response_data['field_conflict'] = 'group_id'
+                    response_status = status.HTTP_406_NOT_ACCEPTABLE
             elif relationship_type == RELATIONSHIP_TYPES['graph']:
                 from_group_relationship.add_linked_group_relationship(to_group_relationship)
             else:
@@ -391,6 +458,58 @@ class GroupsGroupsList(SecureAPIView):
             response_status = status.HTTP_404_NOT_FOUND
         return Response(response_data, status=response_status)
 
+    def _post_linked_groups(self, request, group_id):
+        """
+        POST /api/groups/{group_id}/groups/ with a list of group_ids
+        """
+        if isinstance(request.DATA, QueryDict):
+            # form-encoded requests repeat the field once per group id
+            to_group_ids = request.DATA.getlist('group_ids')
+        else:
+            to_group_ids = request.DATA['group_ids']
+        relationship_type = request.DATA.get('relationship_type', None)
+        if not isinstance(to_group_ids, list) or not all(is_int(to_group_id) for to_group_id in to_group_ids):
+            return Response({}, status=status.HTTP_400_BAD_REQUEST)
+        if relationship_type != RELATIONSHIP_TYPES['graph']:
+            response_data = {
+                'message': "Relationship type '%s' not currently supported for multiple groups" % relationship_type,
+                'field_conflict': 'relationship_type',
+            }
+            return Response(response_data, status=status.HTTP_406_NOT_ACCEPTABLE)
+        try:
+            from_group_relationship = GroupRelationship.objects.get(group__id=group_id)
+        except ObjectDoesNotExist:
+            return Response({}, status=status.HTTP_404_NOT_FOUND)
+        to_group_ids = set(int(to_group_id) for to_group_id in to_group_ids)
+        existing_group_ids = set(GroupRelationship.objects.filter(group__in=to_group_ids).values_list('group', flat=True))
+        if existing_group_ids != to_group_ids:
+            return Response({}, status=status.HTTP_404_NOT_FOUND)
+        from_group_relationship.add_linked_group_relationships(to_group_ids)
+        base_uri = generate_base_uri(request)
+        response_data = [
+            {
+                'uri': '{}/{}'.format(base_uri, to_group_id),
+                'group_id': str(to_group_id),
+                'relationship_type': relationship_type,
+            }
+            for to_group_id in sorted(to_group_ids)
+        ]
+        return Response(response_data, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, group_id):
+        """
+        DELETE /api/groups/{group_id}/groups/?group_ids={related_group_id},{related_group_id}
+        """
+        to_group_ids = request.QUERY_PARAMS.get('group_ids', '').split(',')
+        if not all(is_int(to_group_id) for to_group_id in to_group_ids):
+            return Response({}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            from_group_relationship = GroupRelationship.objects.get(group__id=group_id)
+        except ObjectDoesNotExist:
+            return Response({}, status=status.HTTP_404_NOT_FOUND)
+        from_group_relationship.remove_linked_group_relationships(int(to_group_id) for to_group_id in to_group_ids)
+        return Response({}, status=status.HTTP_204_NO_CONTENT)
+
     def get(self, request, group_id):
         """
         GET /api/groups/{group_id}/groups/{related_group_id}
@@ -403,6 +522,15 @@ class GroupsGroupsList(SecureAPIView):
         if from_group_relationship:
             base_uri = generate_base_uri(request)
             group_type = request.QUERY_PARAMS.get('type', None)
+            depth = request.QUERY_PARAMS.get('depth', None)
+            if depth is not None and not is_int(depth):
+                return Response({}, status=status.HTTP_400_BAD_REQUEST)
+            max_depth = int(depth) if depth is not None else None
+            hierarchy = []
+            if str2bool(request.QUERY_PARAMS.get('descendants', 'false')):
+                hierarchy.append(('descendant', from_group_relationship.get_descendants(max_depth)))
+            if str2bool(request.QUERY_PARAMS.get('ancestors', 'false')):
+                hierarchy.append(('ancestor', from_group_relationship.get_ancestors(max_depth)))
             child_groups = GroupRelationship.objects.filter(parent_group_id=group_id)
             linked_groups = from_group_relationship.get_linked_group_relationships()
             if group_type:
@@ -410,7 +538,21 @@ class GroupsGroupsList(SecureAPIView):
                 if profiles:
                     child_groups = child_groups.filter(group_id__in=profiles)
                     linked_groups = linked_groups.filter(to_group_relationship__in=profiles)
-            if child_groups:
+                    hierarchy = [
+                        (field, links.filter(**{'{}__in'.format(field): profiles}))
+                        for field, links in hierarchy
+                    ]
+            if hierarchy:
+                for field, links in hierarchy:
+                    for related_group_id, related_depth in links.order_by('depth').values_list(field, 'depth'):
+                        response_data.append({
+                            "id": related_group_id,
+                            "relationship_type": RELATIONSHIP_TYPES['hierarchical'],
+                            "direction": field,
+                            "depth": related_depth,
+                            "uri": '{}/{}'.format(base_uri, related_group_id)
+                        })
+            elif child_groups:
                 for group in child_groups:
                     response_data.append({
                         "id": group.group_id,
@@ -525,7 +667,7 @@ class GroupsCoursesList(SecureAPIView):
         base_uri = generate_base_uri(request)
         response_data['uri'] = '{}/{}'.format(base_uri, course_id)
 
-        existing_course, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        existing_course, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not existing_course:
             return Response({}, status.HTTP_404_NOT_FOUND)
 
@@ -556,7 +698,7 @@ class GroupsCoursesList(SecureAPIView):
         members = CourseGroupRelationship.objects.filter(group=existing_group)
         response_data = []
         for member in members:
-            course, course_key, course_content = get_course(request, request.user, member.course_id)  # pylint: disable=W0612
+            course, course_key = get_course_descriptor(member.course_id)  # pylint: disable=W0612
             course_data = {
                 'course_id': member.course_id,
                 'display_name': course.display_name
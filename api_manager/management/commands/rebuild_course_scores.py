@@ -0,0 +1,39 @@
+"""
+Rebuilds the materialized per-user course score table from StudentModule grades
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from api_manager.courseware_access import get_course_key
+from api_manager.models import CourseUserScore
+from courseware.models import StudentModule
+
+
+class Command(BaseCommand):
+    """
+    Recalculates CourseUserScore rows for every user with graded modules, or for the courses given as arguments
+    """
+    args = '<course_id course_id ...>'
+
+    @transaction.commit_on_success
+    def handle(self, *args, **options):
+        modules = StudentModule.objects.filter(grade__isnull=False, max_grade__isnull=False, max_grade__gt=0)
+        scores = CourseUserScore.objects.all()
+        if args:
+            course_keys = [get_course_key(course_id) for course_id in args]
+            modules = modules.filter(course_id__in=course_keys)
+            scores = scores.filter(course_id__in=[unicode(course_key) for course_key in course_keys])
+        scores.delete()
+
+        totals = modules.values('course_id', 'student', 'student__is_active')\
+            .annotate(points_scored=Sum('grade'), points_possible=Sum('max_grade'))
+        CourseUserScore.objects.bulk_create([
+            CourseUserScore(
+                user_id=total['student'],
+                course_id=unicode(total['course_id']),
+                points_scored=total['points_scored'],
+                points_possible=total['points_possible'],
+                user_is_active=total['student__is_active']
+            ) for total in totals.iterator()
+        ])
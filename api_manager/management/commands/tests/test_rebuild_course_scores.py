@@ -0,0 +1,62 @@
+"""
+Run these tests @ Devstack:
+    rake fasttest_lms[common/djangoapps/api_manager/management/commands/tests/test_rebuild_course_scores.py]
+"""
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from api_manager.management.commands import rebuild_course_scores
+from api_manager.models import CourseUserScore
+from courseware.tests.factories import StudentModuleFactory
+from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
+from student.tests.factories import UserFactory
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class RebuildCourseScoresTests(TestCase):
+    """
+    Test suite for the course score rebuild script
+    """
+
+    def setUp(self):
+        self.course = CourseFactory.create()
+        self.item = ItemFactory.create(
+            category="mentoring",
+            parent_location=self.course.location,
+            display_name="test problem"
+        )
+        self.user = UserFactory.create()
+        self.other_user = UserFactory.create()
+        for grade, max_grade in ((1, 2), (3, 4), (None, None)):
+            StudentModuleFactory.create(
+                grade=grade,
+                max_grade=max_grade,
+                student=self.user,
+                course_id=self.course.id,
+                module_state_key=self.item.location,
+                module_type='mentoring'
+            )
+        StudentModuleFactory.create(
+            grade=5,
+            max_grade=0,
+            student=self.other_user,
+            course_id=self.course.id,
+            module_state_key=self.item.location,
+            module_type='mentoring'
+        )
+
+    def test_rebuild_course_scores(self):
+        """
+        Test the score table is rebuilt from graded modules only
+        """
+        CourseUserScore.objects.all().delete()
+        CourseUserScore.objects.create(user=self.other_user, course_id=unicode(self.course.id), points_scored=50)
+
+        rebuild_course_scores.Command().handle(unicode(self.course.id))
+
+        scores = CourseUserScore.objects.filter(course_id=unicode(self.course.id))
+        self.assertEqual(len(scores), 1)
+        self.assertEqual(scores[0].user_id, self.user.id)
+        self.assertEqual(scores[0].points_scored, 4)
+        self.assertEqual(scores[0].points_possible, 6)
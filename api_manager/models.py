@@ -1,15 +1,38 @@
 # pylint: disable=E1101
 
 """ Database ORM models managed by this Django app """
+import copy
+import json
+import uuid
 
+from django.conf import settings
 from django.contrib.auth.models import Group, User
-from django.db import models
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 
 from model_utils.models import TimeStampedModel
-from .utils import is_int
+from .utils import is_int, TimedLRUCache
 
+from courseware.models import StudentModule
+from student.models import CourseAccessRole
+from xmodule.modulestore.django import SignalHandler
 from projects.models import Workgroup
 
+GROUP_DATA_CACHE = TimedLRUCache(max_size=getattr(settings, 'API_GROUP_DATA_CACHE_SIZE', 10000))
+# Cache backends substitute their default timeout for None or 0, so tokens meant to
+# live until they are rotated are stored with the longest timeout memcached accepts
+COURSE_GENERATION_TIMEOUT = 60 * 60 * 24 * 30
+
+
+class GroupRelationshipCycleError(Exception):
+    """
+    Raised when a group would be placed below itself or one of its descendants
+    """
+    pass
+
 
 class GroupRelationship(TimeStampedModel):
     """
@@ -28,24 +51,68 @@ class GroupRelationship(TimeStampedModel):
                                            related_name="linked_to+"),
     record_active = models.BooleanField(default=True)
 
+    def save(self, *args, **kwargs):
+        """
+        Saves the relationship, keeping the GroupRelationshipClosure rows in step with the hierarchy.
+        Raises GroupRelationshipCycleError when the group would be placed below itself or one of its descendants
+        """
+        with transaction.commit_on_success():
+            created = self._state.adding
+            parent_changed = created
+            if not created:
+                stored_parent_ids = GroupRelationship.objects.select_for_update().filter(pk=self.pk)\
+                    .values_list('parent_group', flat=True)
+                parent_changed = not stored_parent_ids or stored_parent_ids[0] != self.parent_group_id
+            if parent_changed and not created and self.parent_group_id:
+                # Lock the group and the new ancestry, so two moves which would cross each other are
+                # serialized and the second one sees the hierarchy written by the first
+                ancestor_ids = list(GroupRelationshipClosure.objects.select_for_update()
+                                    .filter(descendant=self.parent_group_id).values_list('ancestor', flat=True))
+                list(GroupRelationship.objects.select_for_update().filter(pk__in=ancestor_ids + [self.pk])
+                     .order_by('pk').values_list('pk', flat=True))
+                if GroupRelationshipClosure.objects.select_for_update()\
+                        .filter(ancestor=self.pk, descendant=self.parent_group_id).exists():
+                    raise GroupRelationshipCycleError("A group cannot be placed below itself or one of its descendants")
+            super(GroupRelationship, self).save(*args, **kwargs)
+            if parent_changed:
+                GroupRelationshipClosure.sync(self, created)
+
+    def get_descendants(self, max_depth=None):
+        """ Retrieve the closure rows of the groups below this one, optionally limited to max_depth levels """
+        descendants = GroupRelationshipClosure.objects.filter(ancestor=self, depth__gt=0)
+        if max_depth is not None:
+            descendants = descendants.filter(depth__lte=max_depth)
+        return descendants
+
+    def get_ancestors(self, max_depth=None):
+        """ Retrieve the closure rows of the groups above this one, optionally limited to max_depth levels """
+        ancestors = GroupRelationshipClosure.objects.filter(descendant=self, depth__gt=0)
+        if max_depth is not None:
+            ancestors = ancestors.filter(depth__lte=max_depth)
+        return ancestors
+
     def add_linked_group_relationship(self, to_group_relationship, symmetrical=True):
         """ Create a new group-group relationship """
-        relationship = LinkedGroupRelationship.objects.get_or_create(
-            from_group_relationship=self,
-            to_group_relationship=to_group_relationship)
-        if symmetrical:
-            # avoid recursion by passing `symm=False`
-            to_group_relationship.add_linked_group_relationship(self, False)
+        with transaction.commit_on_success():
+            relationship = LinkedGroupRelationship.objects.get_or_create(
+                from_group_relationship=self,
+                to_group_relationship=to_group_relationship)
+            if symmetrical:
+                # avoid recursion by passing `symm=False`
+                to_group_relationship.add_linked_group_relationship(self, False)
+        invalidate_linked_group_ids([self.pk, to_group_relationship.pk])
         return relationship
 
     def remove_linked_group_relationship(self, to_group_relationship, symmetrical=True):
         """ Remove an existing group-group relationship """
-        LinkedGroupRelationship.objects.filter(
-            from_group_relationship=self,
-            to_group_relationship=to_group_relationship).delete()
-        if symmetrical:
-            # avoid recursion by passing `symm=False`
-            to_group_relationship.remove_linked_group_relationship(self, False)
+        with transaction.commit_on_success():
+            LinkedGroupRelationship.objects.filter(
+                from_group_relationship=self,
+                to_group_relationship=to_group_relationship).delete()
+            if symmetrical:
+                # avoid recursion by passing `symm=False`
+                to_group_relationship.remove_linked_group_relationship(self, False)
+        invalidate_linked_group_ids([self.pk, to_group_relationship.pk])
         return
 
     def get_linked_group_relationships(self):
@@ -54,18 +121,39 @@ class GroupRelationship(TimeStampedModel):
         matching_relationships = efferent_relationships
         return matching_relationships
 
+    def add_linked_group_relationships(self, to_group_relationship_ids):
+        """ Create the group-group relationships, in both directions, with many groups at once """
+        to_group_relationship_ids = set(to_group_relationship_ids)
+        pairs = set()
+        for to_group_relationship_id in to_group_relationship_ids:
+            pairs.add((self.pk, to_group_relationship_id))
+            pairs.add((to_group_relationship_id, self.pk))
+        with transaction.commit_on_success():
+            existing = set(LinkedGroupRelationship.objects.filter(
+                Q(from_group_relationship=self, to_group_relationship__in=to_group_relationship_ids) |
+                Q(from_group_relationship__in=to_group_relationship_ids, to_group_relationship=self)
+            ).values_list('from_group_relationship', 'to_group_relationship'))
+            LinkedGroupRelationship.objects.bulk_create([
+                LinkedGroupRelationship(from_group_relationship_id=from_id, to_group_relationship_id=to_id)
+                for from_id, to_id in pairs - existing
+            ])
+        invalidate_linked_group_ids([self.pk] + list(to_group_relationship_ids))
+
+    def remove_linked_group_relationships(self, to_group_relationship_ids):
+        """ Remove the group-group relationships, in both directions, with many groups at once """
+        to_group_relationship_ids = set(to_group_relationship_ids)
+        with transaction.commit_on_success():
+            LinkedGroupRelationship.objects.filter(
+                Q(from_group_relationship=self, to_group_relationship__in=to_group_relationship_ids) |
+                Q(from_group_relationship__in=to_group_relationship_ids, to_group_relationship=self)
+            ).delete()
+        invalidate_linked_group_ids([self.pk] + list(to_group_relationship_ids))
+
     def check_linked_group_relationship(self, relationship_to_check, symmetrical=False):
         """ Confirm the existence of a possibly-existing group-group relationship """
-        query = dict(
-            to_group_relationships__from_group_relationship=self,
-            to_group_relationships__to_group_relationship=relationship_to_check,
-        )
-        if symmetrical:
-            query.update(
-                from_group_relationships__to_group_relationship=self,
-                from_group_relationships__from_group_relationship=relationship_to_check,
-            )
-        return GroupRelationship.objects.filter(**query).exists()
+        if relationship_to_check.pk not in get_linked_group_ids(self.pk):
+            return False
+        return not symmetrical or self.pk in get_linked_group_ids(relationship_to_check.pk)
 
 
 class LinkedGroupRelationship(TimeStampedModel):
@@ -84,6 +172,42 @@ class LinkedGroupRelationship(TimeStampedModel):
     record_active = models.BooleanField(default=True)
 
 
+class GroupRelationshipClosure(models.Model):
+    """
+    The GroupRelationshipClosure model holds one row for every (ancestor, descendant) pair of the
+    GroupRelationship hierarchy, including a depth 0 row for each group itself, so that whole
+    subtrees and ancestries can be read with a single indexed query
+    """
+    ancestor = models.ForeignKey(GroupRelationship, related_name="descendant_links")
+    descendant = models.ForeignKey(GroupRelationship, related_name="ancestor_links")
+    depth = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        """
+        Meta class for enforcing one row per ancestor/descendant pair
+        """
+        unique_together = ("ancestor", "descendant")
+
+    @classmethod
+    def sync(cls, group_relationship, created=False):
+        """
+        Attaches the subtree rooted at the specified relationship below its current parent group
+        """
+        if created:
+            cls.objects.get_or_create(ancestor_id=group_relationship.pk, descendant_id=group_relationship.pk)
+        subtree = list(cls.objects.filter(ancestor=group_relationship.pk).values_list('descendant', 'depth'))
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+        if not created:
+            cls.objects.filter(descendant__in=subtree_ids).exclude(ancestor__in=subtree_ids).delete()
+        if group_relationship.parent_group_id:
+            ancestors = cls.objects.filter(descendant=group_relationship.parent_group_id).values_list('ancestor', 'depth')
+            cls.objects.bulk_create([
+                cls(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + descendant_depth + 1)
+                for ancestor_id, ancestor_depth in ancestors
+                for descendant_id, descendant_depth in subtree
+            ])
+
+
 class CourseGroupRelationship(TimeStampedModel):
     """
     The CourseGroupRelationship model contains information describing the
@@ -103,7 +227,8 @@ class GroupProfile(TimeStampedModel):
 
     class Meta:
         """
-        Meta class for modifying things like table name
+        Meta class for modifying things like table name; indexes on (group_type, group)
+        and (group_type, name) are created by migration 0017
         """
         db_table = "auth_groupprofile"
 
@@ -113,6 +238,81 @@ class GroupProfile(TimeStampedModel):
     data = models.TextField(blank=True)  # JSON dictionary for generic key/value pairs
     record_active = models.BooleanField(default=True)
 
+    def save(self, *args, **kwargs):
+        """
+        Saves the profile, keeping the GroupProfileData rows in step with the JSON data
+        """
+        stored_data = None
+        if self.pk:
+            stored_data = GroupProfile.objects.filter(pk=self.pk).values_list('data', flat=True)
+            stored_data = stored_data[0] if stored_data else None
+        super(GroupProfile, self).save(*args, **kwargs)
+        if (self.data or None) != (stored_data or None):
+            GroupProfileData.sync(self)
+
+    def get_data(self):
+        """
+        Returns a copy of the parsed JSON data of the profile, memoized per saved version of the profile
+        """
+        if not self.data:
+            return None
+        cache_key = (self.pk, self.modified)
+        cached = GROUP_DATA_CACHE.get(cache_key)
+        if cached is not None and cached[0] == self.data:
+            data = cached[1]
+        else:
+            data = json.loads(self.data)
+            GROUP_DATA_CACHE.set(cache_key, (self.data, data))
+        return copy.deepcopy(data)
+
+
+class GroupProfileData(models.Model):
+    """
+    The GroupProfileData model holds the top-level key/value pairs of GroupProfile.data
+    in indexed columns, so that groups can be looked up by their data
+    """
+    group_profile = models.ForeignKey(GroupProfile, related_name="data_items")
+    key = models.CharField(max_length=255)
+    value = models.CharField(max_length=255, null=True, blank=True)
+
+    class Meta:
+        """
+        Meta class for enforcing one row per profile and key; an index on (key, value)
+        is created by migration 0016
+        """
+        unique_together = ("group_profile", "key")
+
+    @classmethod
+    def items_from_data(cls, data):
+        """
+        Returns the (key, value) pairs to store for the JSON data of a profile. Values are stored
+        as text (nested values as JSON); pairs which don't fit in the columns are left out
+        """
+        try:
+            data = json.loads(data) if data else {}
+        except ValueError:
+            return []
+        if not isinstance(data, dict):
+            return []
+        items = []
+        for key, value in data.iteritems():
+            if value is not None and not isinstance(value, basestring):
+                value = json.dumps(value)
+            if len(key) <= 255 and (value is None or len(value) <= 255):
+                items.append((key, value))
+        return items
+
+    @classmethod
+    def sync(cls, group_profile):
+        """
+        Replaces the stored pairs of the specified profile with those of its current data
+        """
+        cls.objects.filter(group_profile=group_profile).delete()
+        cls.objects.bulk_create([
+            cls(group_profile=group_profile, key=key, value=value)
+            for key, value in cls.items_from_data(group_profile.data)
+        ])
+
 
 class CourseContentGroupRelationship(TimeStampedModel):
     """
@@ -154,6 +354,8 @@ class CourseModuleCompletion(TimeStampedModel):
     The CourseModuleCompletion model contains user, course, module information
     to monitor a user's progression throughout the duration of a course,
     we need to observe and record completions of the individual course modules.
+    Composite indexes on (course_id, user, content_id, stage) and (course_id, content_id, stage),
+    matching the completion list filters, are created by migration 0015.
     """
     user = models.ForeignKey(User, db_index=True, related_name="course_completions")
     course_id = models.CharField(max_length=255, db_index=True)
@@ -161,6 +363,325 @@ class CourseModuleCompletion(TimeStampedModel):
     stage = models.CharField(max_length=255, null=True, blank=True)
 
 
+class CourseUserCompletionCount(TimeStampedModel):
+    """
+    The CourseUserCompletionCount model keeps a running count of the module
+    completions a user has recorded in a course, so the completions leaderboard
+    can be read from one row per user instead of counting every completion.
+    The active flag of the user is copied to the row, so the (course_id,
+    user_is_active, completions) index created by migration 0020 serves
+    leaderboard ordering and position counts without joining auth_user.
+    """
+    user = models.ForeignKey(User, db_index=True, related_name="course_completion_counts")
+    course_id = models.CharField(max_length=255, db_index=True)
+    completions = models.IntegerField(default=0)
+    user_is_active = models.BooleanField(default=True)
+
+    class Meta:
+        """
+        Meta class for enforcing one counter row per user and course
+        """
+        unique_together = ("user", "course_id")
+
+    @classmethod
+    def increment(cls, course_id, user_id, count=1):
+        """
+        Adds count (which may be negative) to the counter of the specified user in the specified course
+        """
+        counters = cls.objects.filter(course_id=course_id, user_id=user_id)
+        if not counters.update(completions=F('completions') + count):
+            cls.objects.get_or_create(
+                course_id=course_id,
+                user_id=user_id,
+                defaults={'user_is_active': _get_user_is_active(user_id)}
+            )
+            counters.update(completions=F('completions') + count)
+
+
+def _get_user_is_active(user_id):
+    """
+    Returns the active flag to store on a new leaderboard row of the specified user
+    """
+    return User.objects.filter(pk=user_id, is_active=True).exists()
+
+
+@receiver(post_save, sender=CourseModuleCompletion)
+def _increment_completion_count(sender, instance, created, **kwargs):  # pylint: disable=W0613
+    """
+    Counts a newly recorded completion against its user and course
+    """
+    if created:
+        CourseUserCompletionCount.increment(unicode(instance.course_id), instance.user_id)
+
+
+@receiver(post_delete, sender=CourseModuleCompletion)
+def _decrement_completion_count(sender, instance, **kwargs):  # pylint: disable=W0613
+    """
+    Removes a deleted completion from the count of its user and course
+    """
+    CourseUserCompletionCount.increment(unicode(instance.course_id), instance.user_id, -1)
+
+
+class CourseUserScore(TimeStampedModel):
+    """
+    The CourseUserScore model keeps the total of the points a user has scored
+    in a course, so leaderboards and course averages can be read from one row
+    per user instead of being summed from every StudentModule row. Each grade
+    change recalculates the totals of its user, and rows left without any
+    possible points are removed. The active flag of the user is copied to the
+    row, so the (course_id, user_is_active, points_scored) index created by
+    migration 0020 serves leaderboard ordering and position counts without
+    joining auth_user.
+    """
+    user = models.ForeignKey(User, db_index=True, related_name="course_scores")
+    course_id = models.CharField(max_length=255, db_index=True)
+    points_scored = models.FloatField(default=0)
+    points_possible = models.FloatField(default=0)
+    user_is_active = models.BooleanField(default=True)
+
+    class Meta:
+        """
+        Meta class for enforcing one score row per user and course
+        """
+        unique_together = ("user", "course_id")
+
+    @classmethod
+    def _get_or_create(cls, course_id, user_id):
+        """
+        Returns the score row of the specified user in the specified course, creating an empty one if needed
+        """
+        try:
+            score, created = cls.objects.get_or_create(  # pylint: disable=W0612
+                course_id=course_id,
+                user_id=user_id,
+                defaults={'user_is_active': _get_user_is_active(user_id)}
+            )
+        except IntegrityError:
+            # The row was created by a concurrent grade write after the lookup missed it
+            score = cls.objects.get(course_id=course_id, user_id=user_id)
+        return score
+
+    @classmethod
+    def refresh(cls, course_key, user_ids):
+        """
+        Recalculates the score rows of the specified users from their graded StudentModule entries.
+        The rows are created if needed and locked before the totals are summed, so that of two
+        concurrent refreshes of a user the one which writes last has seen both grade changes
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        course_id = unicode(course_key)
+        with transaction.commit_on_success():
+            existing_user_ids = set(cls.objects.filter(course_id=course_id, user__in=user_ids).values_list(
+                'user', flat=True
+            ))
+            for user_id in user_ids - existing_user_ids:
+                cls._get_or_create(course_id, user_id)
+            scores = list(cls.objects.select_for_update().filter(course_id=course_id, user__in=user_ids))
+
+            totals = StudentModule.objects.filter(
+                course_id__exact=course_key,
+                student__in=user_ids,
+                grade__isnull=False,
+                max_grade__isnull=False,
+                max_grade__gt=0
+            ).values('student').annotate(points_scored=Sum('grade'), points_possible=Sum('max_grade'))
+            totals = dict((row['student'], row) for row in totals)
+            for score in scores:
+                total = totals.get(score.user_id)
+                if total is None:
+                    score.delete()
+                elif score.points_scored != total['points_scored'] or score.points_possible != total['points_possible']:
+                    score.points_scored = total['points_scored']
+                    score.points_possible = total['points_possible']
+                    score.save()
+
+
+def _get_module_score(grade, max_grade):
+    """
+    Returns the (points scored, points possible) a StudentModule grade adds to its user's course score
+    """
+    if grade is None or max_grade is None or max_grade <= 0:
+        return 0, 0
+    return grade, max_grade
+
+
+def _refresh_course_user_score(module):
+    """
+    Recalculates the CourseUserScore row and invalidates the cached grades of a module's user
+    """
+    CourseUserScore.refresh(module.course_id, [module.student_id])
+    invalidate_user_grades(unicode(module.course_id), module.student_id)
+
+
+@receiver(pre_save, sender=StudentModule)
+def _read_stored_module_grade(sender, instance, **kwargs):  # pylint: disable=W0613
+    """
+    Remembers the grade stored for a StudentModule row before it is overwritten
+    """
+    instance._api_manager_stored_grade = (None, None)  # pylint: disable=W0212
+    if instance.pk:
+        stored = StudentModule.objects.filter(pk=instance.pk).values_list('grade', 'max_grade')
+        if stored:
+            instance._api_manager_stored_grade = stored[0]  # pylint: disable=W0212
+
+
+@receiver(post_save, sender=StudentModule)
+def update_course_user_score(sender, instance, **kwargs):  # pylint: disable=W0613
+    """
+    Keeps the CourseUserScore row and cached grades of the module's user current as grades are written,
+    removed (set back to None) or changed. Ungraded state changes (position, etc.) don't affect the score
+    """
+    stored_grade, stored_max_grade = getattr(instance, '_api_manager_stored_grade', (None, None))
+    if _get_module_score(stored_grade, stored_max_grade) != _get_module_score(instance.grade, instance.max_grade):
+        _refresh_course_user_score(instance)
+
+
+@receiver(post_delete, sender=StudentModule)
+def remove_course_user_score(sender, instance, **kwargs):  # pylint: disable=W0613
+    """
+    Removes the grade of a deleted module from the CourseUserScore row and cached grades of its user
+    """
+    if _get_module_score(instance.grade, instance.max_grade) != (0, 0):
+        _refresh_course_user_score(instance)
+
+
+def _get_cache_version(key):
+    """
+    Returns the version token stored under the specified cache key, creating one if needed
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex)
+        version = cache.get(key)
+    return version
+
+
+def get_user_grades_version(course_id, user_id):
+    """
+    Returns the current version token of a user's grades in the specified course,
+    which changes whenever one of the user's graded StudentModule entries changes
+    """
+    return _get_cache_version(u'api_manager.user_grades_version.{}.{}'.format(course_id, user_id))
+
+
+def invalidate_user_grades(course_id, user_id):
+    """
+    Rotates the version token of a user's grades in the specified course
+    """
+    cache.set(u'api_manager.user_grades_version.{}.{}'.format(course_id, user_id), uuid.uuid4().hex)
+
+
+def _course_generation_key(course_key):
+    """
+    Shared cache key holding the generation token of a course
+    """
+    return u'api_manager.course_generation.{}'.format(unicode(course_key))
+
+
+def get_course_cache_generation(course_key):
+    """
+    Returns the token identifying the current published version of a course. The token is kept
+    in the shared cache and read on every lookup, so a publish seen by any process (Studio
+    included) is picked up by every LMS process on its next request. Only the course_published
+    receiver rotates the token; a new one is issued if the cache evicts it
+    """
+    generation_key = _course_generation_key(course_key)
+    generation = cache.get(generation_key)
+    if generation is None:
+        cache.add(generation_key, uuid.uuid4().hex, COURSE_GENERATION_TIMEOUT)
+        generation = cache.get(generation_key)
+    return generation
+
+
+def get_course_cache_generations(course_keys):
+    """
+    Bulk version of get_course_cache_generation, returning a dict keyed by course key
+    """
+    generation_keys = dict((_course_generation_key(course_key), course_key) for course_key in course_keys)
+    generations = {}
+    for generation_key, generation in cache.get_many(generation_keys.keys()).iteritems():
+        generations[generation_keys[generation_key]] = generation
+    for course_key in course_keys:
+        if course_key not in generations:
+            generations[course_key] = get_course_cache_generation(course_key)
+    return generations
+
+
+def invalidate_course_cache(course_key):
+    """
+    Discards all cached data derived from the specified course
+    """
+    cache.set(_course_generation_key(course_key), uuid.uuid4().hex, COURSE_GENERATION_TIMEOUT)
+
+
+@receiver(SignalHandler.course_published)
+def _invalidate_published_course(sender, course_key, **kwargs):  # pylint: disable=W0613
+    """
+    Drops cached course data as soon as a new version of the course is published
+    """
+    invalidate_course_cache(course_key)
+
+
+def aggregate_exclusion_cache_key(course_key):
+    """
+    Shared cache key holding the ids of the users excluded from the aggregates of a course
+    """
+    return u'api_manager.aggregate_exclusion.{}'.format(unicode(course_key))
+
+
+@receiver(post_save, sender=CourseAccessRole)
+@receiver(post_delete, sender=CourseAccessRole)
+def _invalidate_aggregate_exclusion(sender, instance, **kwargs):  # pylint: disable=W0613
+    """
+    Discard the cached exclusion set of the course whose roles changed
+    """
+    cache.delete(aggregate_exclusion_cache_key(instance.course_id))
+
+
+def _linked_group_ids_version_key(group_id):
+    """
+    Shared cache key holding the version token of the linked group ids of a group
+    """
+    return u'api_manager.linked_group_ids_version.{}'.format(group_id)
+
+
+def get_linked_group_ids(group_id):
+    """
+    Returns the set of ids of the groups the specified group has a graph relationship to
+    """
+    cache_key = u'api_manager.linked_group_ids.{}.{}'.format(
+        group_id,
+        _get_cache_version(_linked_group_ids_version_key(group_id))
+    )
+    linked_group_ids = cache.get(cache_key)
+    if linked_group_ids is None:
+        linked_group_ids = frozenset(LinkedGroupRelationship.objects.filter(
+            from_group_relationship=group_id
+        ).values_list('to_group_relationship', flat=True))
+        cache.set(cache_key, linked_group_ids, getattr(settings, 'API_LINKED_GROUPS_CACHE_TIMEOUT', 3600))
+    return linked_group_ids
+
+
+def invalidate_linked_group_ids(group_ids):
+    """
+    Rotates the version token of the cached linked group ids of the specified groups. The GroupRelationship
+    methods call this again once their transaction is committed, so a reader which cached the previous
+    links while the transaction was open doesn't keep them
+    """
+    cache.set_many(dict((_linked_group_ids_version_key(group_id), uuid.uuid4().hex) for group_id in group_ids))
+
+
+@receiver(post_save, sender=LinkedGroupRelationship)
+@receiver(post_delete, sender=LinkedGroupRelationship)
+def _invalidate_linked_group_ids(sender, instance, **kwargs):  # pylint: disable=W0613
+    """
+    Invalidates the cached linked group ids of the group a relationship starts from
+    """
+    invalidate_linked_group_ids([instance.from_group_relationship_id])
+
+
 class APIUserQuerySet(models.query.QuerySet):  # pylint: disable=R0924
     """ Custom QuerySet to modify id based lookup """
     def filter(self, *args, **kwargs):
@@ -186,3 +707,15 @@ class APIUser(User):
     class Meta:
         """ Meta attribute to make this a proxy model"""
         proxy = True
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=APIUser)
+def _copy_user_is_active(sender, instance, created, **kwargs):  # pylint: disable=W0613
+    """
+    Copies a user's active flag to their leaderboard rows, which are filtered on it without joining auth_user
+    """
+    if not created:
+        for model in (CourseUserCompletionCount, CourseUserScore):
+            model.objects.filter(user=instance).exclude(user_is_active=instance.is_active)\
+                .update(user_is_active=instance.is_active)
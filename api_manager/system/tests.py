@@ -58,6 +58,8 @@ class SystemApiTests(TestCase):
         self.assertGreater(len(response.data['name']), 0)
         self.assertIsNotNone(response.data['description'])
         self.assertGreater(len(response.data['description']), 0)
+        self.assertIn('hits', response.data['course_cache'])
+        self.assertIn('misses', response.data['course_cache'])
 
     def test_system_detail_api_get(self):
         """ Ensure the system returns base data about the API """
@@ -4,6 +4,7 @@ from django.middleware.csrf import get_token
 from rest_framework import status
 from rest_framework.response import Response
 
+from api_manager.courseware_access import get_course_cache_stats
 from api_manager.permissions import SecureAPIView
 from api_manager.utils import generate_base_uri
 
@@ -21,6 +22,7 @@ class SystemDetail(SecureAPIView):
         response_data['description'] = "System interface for managing groups, users, and sessions."
         response_data['documentation'] = "http://docs.openedxapi.apiary.io/#get-%2Fapi%2Fsystem"
         response_data['uri'] = base_uri
+        response_data['course_cache'] = get_course_cache_stats()
         return Response(response_data, status=status.HTTP_200_OK)
 
 
@@ -14,6 +14,7 @@ from mock import patch
 
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
 from django.test import TestCase, Client
 from django.test.utils import override_settings
 from django.utils.translation import ugettext as _
@@ -29,6 +30,8 @@ from student.models import anonymous_id_for_user
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.modulestore import Location
 
+from api_manager.models import get_course_cache_generation, get_user_grades_version
+
 TEST_API_KEY = str(uuid.uuid4())
 
 
@@ -516,6 +519,41 @@ class UsersApiTests(TestCase):
         self.assertEqual(response.data['groups'][0]['id'], group_id)
         self.assertEqual(response.data['groups'][0]['name'], str(group_name))
 
+    def test_user_groups_list_get_constant_queries(self):
+        test_uri = '/api/users/{}/groups'.format(self.user.id)
+
+        def add_groups(count):
+            """ Create count groups and add the user to them """
+            for __ in xrange(count):
+                response = self.do_post('/api/groups', {'name': str(uuid.uuid4()), 'type': 'test'})
+                self.assertEqual(response.status_code, 201)
+                response = self.do_post(test_uri, {'group_id': response.data['id']})
+                self.assertEqual(response.status_code, 201)
+
+        def count_queries():
+            """ Return the response and the number of queries it took to list the user's groups """
+            connection.use_debug_cursor = True
+            try:
+                query_count = len(connection.queries)
+                response = self.do_get('{}?fields=id,name,type'.format(test_uri))
+                return response, len(connection.queries) - query_count
+            finally:
+                connection.use_debug_cursor = False
+
+        add_groups(2)
+        response, small_query_count = count_queries()
+        self.assertEqual(len(response.data['groups']), 2)
+        self.assertEqual(response.data['groups'][0]['type'], 'test')
+
+        add_groups(10)
+        response, large_query_count = count_queries()
+        self.assertEqual(len(response.data['groups']), 12)
+        self.assertEqual(small_query_count, large_query_count)
+
+        response = self.do_get('{}?fields=id'.format(test_uri))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['groups'][0].keys(), ['id'])
+
     def test_user_groups_list_get_with_query_params(self):
         test_uri = '/api/users'
         local_username = self.test_username + str(randint(11, 99))
@@ -706,6 +744,29 @@ class UsersApiTests(TestCase):
         self.assertEqual(datetime.strftime(response.data[1]['start'], '%Y-%m-%d %H:%M:%S'), datetime.strftime(self.course.start, '%Y-%m-%d %H:%M:%S'))
         self.assertEqual(datetime.strftime(response.data[1]['end'], '%Y-%m-%d %H:%M:%S'), datetime.strftime(self.course.end, '%Y-%m-%d %H:%M:%S'))
 
+    def test_user_courses_list_get_cached_summaries(self):
+        test_uri = '/api/users'
+        local_username = self.test_username + str(randint(11, 99))
+        data = {'email': self.test_email, 'username': local_username, 'password':
+                self.test_password, 'first_name': self.test_first_name, 'last_name': self.test_last_name}
+        response = self.do_post(test_uri, data)
+        user_id = response.data['id']
+        test_uri = '{}/{}/courses'.format(test_uri, str(user_id))
+        data = {'course_id': unicode(self.course.id)}
+        response = self.do_post(test_uri, data)
+        self.assertEqual(response.status_code, 201)
+
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        with patch('api_manager.courseware_access._load_course_descriptor') as mock_load_course:
+            response = self.do_get(test_uri)
+            self.assertFalse(mock_load_course.called)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['id'], unicode(self.course.id))
+        self.assertEqual(response.data[0]['name'], self.course.display_name)
+
     def test_user_courses_list_get_undefined_user(self):
         test_uri = '/api/users/2134234/courses'
         response = self.do_get(test_uri)
@@ -918,6 +979,44 @@ class UsersApiTests(TestCase):
         self.assertGreater(response.data['position'], 0) # Position in the GET response is an integer!
         self.assertEqual(response.data['position_tree']['chapter']['id'], unicode(chapter1.scope_ids.usage_id))
 
+    def test_user_courses_detail_position_per_user(self):
+        course = CourseFactory.create()
+        chapter1 = ItemFactory.create(
+            category="chapter",
+            parent_location=course.location,
+            data=self.test_course_data,
+            display_name="Chapter 1"
+        )
+        chapter2 = ItemFactory.create(
+            category="chapter",
+            parent_location=course.location,
+            data=self.test_course_data,
+            display_name="Chapter 2"
+        )
+        users = [UserFactory.create(), UserFactory.create()]
+        chapters = [chapter2, chapter1]
+        for user, chapter in zip(users, chapters):
+            test_uri = '/api/users/{}/courses'.format(user.id)
+            response = self.do_post(test_uri, {'course_id': unicode(course.id)})
+            self.assertEqual(response.status_code, 201)
+            position_data = {
+                'position': {
+                    'parent_content_id': unicode(course.id),
+                    'child_content_id': unicode(chapter.scope_ids.usage_id)
+                }
+            }
+            response = self.do_post('{}/{}'.format(test_uri, unicode(course.id)), data=position_data)
+            self.assertEqual(response.data['position'], unicode(chapter.scope_ids.usage_id))
+
+        # Each user keeps their own position however the requests are interleaved
+        for user, chapter, position in zip(users, chapters, [2, 1]):
+            response = self.do_get('/api/users/{}/courses/{}'.format(user.id, unicode(course.id)))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['position_tree']['chapter']['id'], unicode(chapter.scope_ids.usage_id))
+            response = self.do_get('/api/courses/{}/users/{}'.format(unicode(course.id), user.id))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['position'], position)
+
     def test_user_courses_detail_get_invalid_course(self):
         test_uri = '/api/users/{}/courses/{}'.format(self.user.id, self.test_bogus_course_id)
         response = self.do_get(test_uri)
@@ -1174,6 +1273,206 @@ class UsersApiTests(TestCase):
         self.assertEqual(response.data['current_grade'], 50)
         self.assertEqual(response.data['pro_forma_grade'], 100)
 
+    def test_course_grades_cached(self):
+        course = CourseFactory.create()
+        chapter = ItemFactory.create(
+            category="chapter",
+            parent_location=course.location,
+            display_name="Chapter 1"
+        )
+        problem = ItemFactory.create(
+            parent_location=chapter.location,
+            category='problem',
+            data=StringResponseXMLFactory().build_xml(answer='foo'),
+            display_name="test problem 1"
+        )
+        module = StudentModuleFactory.create(
+            grade=1,
+            max_grade=4,
+            student=self.user,
+            course_id=course.id,
+            module_state_key=problem.location,
+            module_type='problem'
+        )
+        test_uri = '/api/users/{}/courses/{}/grades'.format(self.user.id, unicode(course.id))
+
+        response = self.do_get('{}?fields=current_grade,pro_forma_grade'.format(test_uri))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data.keys()), ['current_grade', 'pro_forma_grade'])
+        self.assertEqual(response.data['pro_forma_grade'], 25)
+
+        with patch('api_manager.users.views.get_course_progress') as mock_get_course_progress:
+            response = self.do_get('{}?fields=current_grade,pro_forma_grade'.format(test_uri))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['pro_forma_grade'], 25)
+            self.assertFalse(mock_get_course_progress.called)
+
+        # Fields which don't need the course tree are calculated without walking it
+        cache.clear()
+        with patch('api_manager.users.views.get_course_progress') as mock_get_course_progress:
+            with patch('api_manager.users.views.grades.grade') as mock_grade:
+                response = self.do_get('{}?fields=pro_forma_grade,grading_policy'.format(test_uri))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(sorted(response.data.keys()), ['grading_policy', 'pro_forma_grade'])
+                self.assertEqual(response.data['pro_forma_grade'], 25)
+                self.assertFalse(mock_get_course_progress.called)
+                self.assertFalse(mock_grade.called)
+
+        response = self.do_get('{}?fields=current_grade,bogus'.format(test_uri))
+        self.assertEqual(response.status_code, 400)
+
+        # Updating one of the user's grades invalidates the cached gradebook
+        module.grade = 2
+        module.save()
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['pro_forma_grade'], 50)
+        self.assertIn('courseware_summary', response.data)
+        self.assertIn('grade_summary', response.data)
+
+    @override_settings(API_CACHE_CHUNK_SIZE=64)
+    def test_course_grades_cached_chunked(self):
+        course = CourseFactory.create()
+        chapter = ItemFactory.create(
+            category="chapter",
+            parent_location=course.location,
+            display_name="Chapter 1"
+        )
+        problem = ItemFactory.create(
+            parent_location=chapter.location,
+            category='problem',
+            data=StringResponseXMLFactory().build_xml(answer='foo'),
+            display_name="test problem 1"
+        )
+        StudentModuleFactory.create(
+            grade=1,
+            max_grade=4,
+            student=self.user,
+            course_id=course.id,
+            module_state_key=problem.location,
+            module_type='problem'
+        )
+        test_uri = '/api/users/{}/courses/{}/grades'.format(self.user.id, unicode(course.id))
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        gradebook = response.data
+
+        # The gradebook is stored in several chunks, all of which are needed to read it back
+        cache_key = u'api_manager.user_grades.{}.{}.{}.{}'.format(
+            course.id,
+            self.user.id,
+            get_course_cache_generation(course.id),
+            get_user_grades_version(unicode(course.id), self.user.id)
+        )
+        self.assertGreater(cache.get(cache_key), 1)
+        with patch('api_manager.users.views.get_course_progress') as mock_get_course_progress:
+            response = self.do_get(test_uri)
+            self.assertFalse(mock_get_course_progress.called)
+        self.assertEqual(response.data, gradebook)
+
+        cache.delete('{}.0'.format(cache_key))
+        response = self.do_get(test_uri)
+        self.assertEqual(response.data, gradebook)
+        self.assertIsNotNone(cache.get('{}.0'.format(cache_key)))
+
+    def _create_graded_course(self):
+        """ Creates a course graded as Homework only (3 assignments, none dropped) with a 40% pass mark """
+        return CourseFactory.create(grading_policy={
+            'GRADER': [{'type': 'Homework', 'min_count': 3, 'drop_count': 0, 'short_label': 'HW', 'weight': 1.0}],
+            'GRADE_CUTOFFS': {'Pass': 0.4},
+        })
+
+    def _get_gradebook(self, course):
+        """ Returns the gradebook of the user in the specified course """
+        test_uri = '/api/users/{}/courses/{}/grades'.format(self.user.id, unicode(course.id))
+        response = self.do_get(test_uri)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def _create_graded_section(self, parent, display_name, grade, max_grade, metadata=None):
+        """ Creates a graded Homework section holding one problem, with the specified score for the user """
+        section_metadata = {'graded': True, 'format': 'Homework'}
+        section_metadata.update(metadata or {})
+        section = ItemFactory.create(
+            category="sequential",
+            parent_location=parent.location,
+            metadata=section_metadata,
+            display_name=display_name
+        )
+        problem = ItemFactory.create(
+            parent_location=section.location,
+            category='problem',
+            data=StringResponseXMLFactory().build_xml(answer='foo'),
+            display_name=u"{} problem".format(display_name)
+        )
+        if max_grade is not None:
+            StudentModuleFactory.create(
+                grade=grade,
+                max_grade=max_grade,
+                student=self.user,
+                course_id=parent.location.course_key,
+                module_state_key=problem.location,
+                module_type='problem'
+            )
+        return section
+
+    def test_course_grades_multiple_sections(self):
+        course = self._create_graded_course()
+        chapter = ItemFactory.create(category="chapter", parent_location=course.location, display_name="Chapter 1")
+        self._create_graded_section(chapter, "Sequence 1", 1, 2)
+        self._create_graded_section(chapter, "Sequence 2", 2, 2)
+        self._create_graded_section(chapter, "Sequence 3", None, None)
+        gradebook = self._get_gradebook(course)
+
+        # Homework averages 1/2, 2/2 and an unattempted 0
+        grade_summary = gradebook['grade_summary']
+        self.assertEqual([section['percent'] for section in grade_summary['section_breakdown'][:3]], [0.5, 1.0, 0])
+        self.assertEqual(grade_summary['percent'], 0.5)
+        self.assertEqual(grade_summary['grade'], 'Pass')
+
+        self.assertEqual(len(gradebook['courseware_summary']), 1)
+        self.assertEqual(len(gradebook['courseware_summary'][0]['sections']), 3)
+        # 3 points scored of the 4 attempted, and of the 5 the course offers
+        self.assertEqual(gradebook['pro_forma_grade'], 75)
+        self.assertEqual(gradebook['current_grade'], 60)
+
+    def test_course_grades_zero_possible_section(self):
+        course = self._create_graded_course()
+        chapter = ItemFactory.create(category="chapter", parent_location=course.location, display_name="Chapter 1")
+        self._create_graded_section(chapter, "Sequence 1", 1, 2)
+        self._create_graded_section(chapter, "Sequence 2", 0, 0)
+        grade_summary = self._get_gradebook(course)['grade_summary']
+
+        # A section without any possible points counts as 0, as does the missing third assignment
+        self.assertEqual([section['percent'] for section in grade_summary['section_breakdown'][:3]], [0.5, 0, 0])
+        self.assertEqual(grade_summary['percent'], 0.17)
+        self.assertIsNone(grade_summary['grade'])
+
+    def test_course_grades_hidden_sections(self):
+        course = self._create_graded_course()
+        chapter = ItemFactory.create(category="chapter", parent_location=course.location, display_name="Chapter 1")
+        hidden_chapter = ItemFactory.create(
+            category="chapter",
+            parent_location=course.location,
+            metadata={'hide_from_toc': True},
+            display_name="Hidden Chapter"
+        )
+        self._create_graded_section(chapter, "Sequence 1", 1, 2)
+        self._create_graded_section(chapter, "Staff Sequence", 2, 2, metadata={'visible_to_staff_only': True})
+        self._create_graded_section(hidden_chapter, "Hidden Sequence", 2, 2)
+        self._create_graded_section(
+            chapter, "Future Sequence", 2, 2, metadata={'start': datetime(2100, 1, 1).isoformat()}
+        )
+        gradebook = self._get_gradebook(course)
+
+        # Only the section the user can see is summarized
+        courseware_summary = gradebook['courseware_summary']
+        self.assertEqual([chapter_summary['display_name'] for chapter_summary in courseware_summary], ['Chapter 1'])
+        self.assertEqual(
+            [section['display_name'] for section in courseware_summary[0]['sections']],
+            ['Sequence 1']
+        )
+
     def is_user_profile_created_updated(self, response, data):
         """This function compare response with user profile data """
 
@@ -34,11 +34,15 @@ from util.password_policy_validators import (
 )
 
 from api_manager.courses.serializers import CourseModuleCompletionSerializer
-from api_manager.courseware_access import get_course, get_course_child, get_course_total_score
+from api_manager.courseware_access import (
+    get_course, get_course_child, get_course_cache_generation, get_course_descriptor, get_course_key,
+    get_course_progress, get_course_summaries
+)
 from api_manager.permissions import SecureAPIView, SecureListAPIView, IdsInFilterBackend, HasOrgsFilterBackend
-from api_manager.models import GroupProfile, APIUser as User
+from api_manager.models import APIUser as User, get_user_grades_version
 from api_manager.organizations.serializers import OrganizationSerializer
-from api_manager.utils import generate_base_uri
+from api_manager.utils import generate_base_uri, get_chunked_cache_value, get_group_list_values, \
+    set_chunked_cache_value
 from projects.serializers import BasicWorkgroupSerializer
 from .serializers import UserSerializer, UserCountByCitySerializer, UserRolesSerializer
 
@@ -527,6 +531,7 @@ class UsersGroupsList(SecureAPIView):
     * Use the UsersGroupsList view to manage Group membership for a specific User
     * For example, you could display a list of all of a User's groups in a dashboard or administrative view
     * Optionally include the 'type' parameter to retrieve a subset of groups with a matching 'group_type' value
+    * Optionally include the 'fields' parameter to select the group attributes returned, among id, name and type
     """
 
     def post(self, request, user_id):
@@ -556,7 +561,7 @@ class UsersGroupsList(SecureAPIView):
 
     def get(self, request, user_id):
         """
-        GET /api/users/{user_id}/groups?type=workgroup
+        GET /api/users/{user_id}/groups?type=workgroup&fields=id,name,type
         """
         try:
             existing_user = User.objects.get(id=user_id)
@@ -569,13 +574,7 @@ class UsersGroupsList(SecureAPIView):
         groups = existing_user.groups.all()
         if group_type:
             groups = groups.filter(groupprofile__group_type=group_type)
-        response_data['groups'] = []
-        for group in groups:
-            group_profile = GroupProfile.objects.get(group_id=group.id)
-            group_data = {}
-            group_data['id'] = group.id
-            group_data['name'] = group_profile.name
-            response_data['groups'].append(group_data)
+        response_data['groups'] = get_group_list_values(groups, request.QUERY_PARAMS.get('fields', None))
         return Response(response_data, status=status.HTTP_200_OK)
 
 
@@ -641,7 +640,7 @@ class UsersCoursesList(SecureAPIView):
         course_id = request.DATA['course_id']
         try:
             user = User.objects.get(id=user_id)
-            course_descriptor, course_key, course_content = get_course(request, user, course_id)  # pylint: disable=W0612
+            course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
             if not course_descriptor:
                 return Response({}, status=status.HTTP_404_NOT_FOUND)
         except (ObjectDoesNotExist, ValueError):
@@ -663,20 +662,21 @@ class UsersCoursesList(SecureAPIView):
             user = User.objects.get(id=user_id)
         except ObjectDoesNotExist:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
-        enrollments = CourseEnrollment.enrollments_for_user(user=user)
+        enrollments = list(CourseEnrollment.enrollments_for_user(user=user))
+        course_summaries = get_course_summaries([enrollment.course_id for enrollment in enrollments])
         response_data = []
         for enrollment in enrollments:
-            course_descriptor, course_key, course_content = get_course(request, user, unicode(enrollment.course_id))  # pylint: disable=W0612
+            course_summary = course_summaries.get(enrollment.course_id)
             # NOTE: It is possible that a course has been hard deleted from the courseware
             # database, but the enrollment row in the SQL database still exists
-            if course_descriptor:
+            if course_summary:
                 course_data = {
-                    "id": unicode(course_key),
-                    "uri": '{}/{}'.format(base_uri, unicode(course_key)),
+                    "id": course_summary['id'],
+                    "uri": '{}/{}'.format(base_uri, course_summary['id']),
                     "is_active": enrollment.is_active,
-                    "name": course_descriptor.display_name,
-                    "start": getattr(course_descriptor, 'start', None),
-                    "end": getattr(course_descriptor, 'end', None)
+                    "name": course_summary['name'],
+                    "start": course_summary['start'],
+                    "end": course_summary['end']
                 }
                 response_data.append(course_data)
             else:
@@ -722,7 +722,7 @@ class UsersCoursesDetail(SecureAPIView):
             user = User.objects.get(id=user_id, is_active=True)
         except ObjectDoesNotExist:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
-        course_descriptor, course_key, course_content = get_course(request, user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         response_data['user_id'] = user.id
@@ -750,7 +750,7 @@ class UsersCoursesDetail(SecureAPIView):
         base_uri = generate_base_uri(request)
         try:
             user = User.objects.get(id=user_id, is_active=True)
-            course_descriptor, course_key, course_content = get_course(request, user, course_id, depth=2)
+            course_descriptor, course_key = get_course_descriptor(course_id, depth=2, use_cache=False)
         except (ObjectDoesNotExist, ValueError):
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         if not CourseEnrollment.is_enrolled(user, course_key):
@@ -796,7 +796,7 @@ class UsersCoursesDetail(SecureAPIView):
             user = User.objects.get(id=user_id, is_active=True)
         except ObjectDoesNotExist:
             return Response({}, status=status.HTTP_204_NO_CONTENT)
-        course_descriptor, course_key, course_content = get_course(request, user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_204_NO_CONTENT)
         CourseEnrollment.unenroll(user, course_key)
@@ -808,64 +808,97 @@ class UsersCoursesGradesDetail(SecureAPIView):
     ### The UsersCoursesGradesDetail view allows clients to interact with the User's gradebook for a particular Course
     - URI: ```/api/users/{user_id}/courses/{course_id}/grades```
     - GET: Returns a JSON representation of the specified Course gradebook
+    To retrieve only some of the gradebook, pass a comma-separated list of fields
+    ```/api/users/{user_id}/courses/{course_id}/grades?fields=current_grade,pro_forma_grade```
     ### Use Cases/Notes:
     * Use the UsersCoursesDetail view to manage the User's gradebook for a Course enrollment
     * Use GET to retrieve the Course gradebook for the specified User
+    * Only the requested fields are calculated; grading_policy and pro_forma_grade don't walk the course
+    * An unknown field name results in a 400 Bad Request response
+    * The gradebook is cached until the User's grades or the Course change
     """
+    fields = ('courseware_summary', 'grade_summary', 'grading_policy', 'current_grade', 'pro_forma_grade')
 
     def get(self, request, user_id, course_id):
         """
         GET /api/users/{user_id}/courses/{course_id}/grades
         """
+        fields = request.QUERY_PARAMS.get('fields', None)
+        if fields:
+            fields = fields.split(',')
+            if any(field not in self.fields for field in fields):
+                return Response({}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            fields = self.fields
 
-        # The pre-fetching of groups is done to make auth checks not require an
-        # additional DB lookup (this kills the Progress page in particular).
-        try:
-            student = User.objects.prefetch_related("groups").get(id=user_id)
-        except ObjectDoesNotExist:
-            return Response({}, status=status.HTTP_404_NOT_FOUND)
-
-        # @TODO: Add authorization check here once we get caller identity
-        # Only student can get his/her own information *or* course staff
-        # can get everyone's grades
-        # get the full course tree with depth=None which reduces the number of
-        # round trips to the database
-        course_descriptor, course_key, course_content = get_course(request, student, course_id, depth=None)  # pylint: disable=W0612
-        if not course_descriptor:
+        course_key = get_course_key(course_id)
+        student_ids = User.objects.filter(id=user_id).values_list('id', flat=True)
+        if not course_key or not student_ids:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
-
-        courseware_summary = grades.progress_summary(student, request, course_descriptor)  # pylint: disable=W0612
-        grade_summary = grades.grade(student, request, course_descriptor)
-        grading_policy = course_descriptor.grading_policy
-
-        queryset = StudentModule.objects.filter(
-            course_id__exact=course_key,
-            max_grade__isnull=False,
-            max_grade__gt=0
+        cache_key = u'api_manager.user_grades.{}.{}.{}.{}'.format(
+            course_key,
+            student_ids[0],
+            get_course_cache_generation(course_key),
+            get_user_grades_version(unicode(course_key), student_ids[0])
         )
+        gradebook = get_chunked_cache_value(cache_key) or {}
+        if any(field not in gradebook for field in fields):
+            # The pre-fetching of groups is done to make auth checks not require an
+            # additional DB lookup (this kills the Progress page in particular).
+            student = User.objects.prefetch_related("groups").get(id=student_ids[0])
+
+            # @TODO: Add authorization check here once we get caller identity
+            # Only student can get his/her own information *or* course staff
+            # can get everyone's grades
+            # get the full course tree with depth=None which reduces the number of
+            # round trips to the database
+            course_descriptor, course_key = get_course_descriptor(course_id, depth=None, use_cache=False)
+            if not course_descriptor:
+                return Response({}, status=status.HTTP_404_NOT_FOUND)
+            self._load_gradebook(request, student, course_descriptor, course_key, gradebook, fields)
+            # The courseware summary of a large course can exceed the item size limit of the cache backend
+            set_chunked_cache_value(cache_key, gradebook, getattr(settings, 'API_USER_GRADES_CACHE_TIMEOUT', 3600))
 
-        total_score = get_course_total_score(courseware_summary)
-        user_queryset = queryset.filter(grade__isnull=False, student=student)
-        comp_modules = user_queryset.aggregate(Sum('grade'))
-        score_of_comp_module = comp_modules['grade__sum'] or 0
-        max_possible_score = user_queryset.aggregate(Sum('max_grade'))
-        current_grade = 0
-        pro_forma_grade = 0
-        if total_score:
-            current_grade = score_of_comp_module / float(total_score) * 100
-
-        if max_possible_score['max_grade__sum']:
-            pro_forma_grade = score_of_comp_module / float(max_possible_score['max_grade__sum']) * 100
-        response_data = {
-            'courseware_summary': courseware_summary,
-            'grade_summary': grade_summary,
-            'grading_policy': grading_policy,
-            'current_grade': current_grade,
-            'pro_forma_grade': pro_forma_grade
-        }
-
+        response_data = dict((field, gradebook[field]) for field in fields)
         return Response(response_data)
 
+    def _load_gradebook(self, request, student, course_descriptor, course_key, gradebook, fields):
+        """
+        Calculates the requested gradebook fields missing from the cached gradebook
+        """
+        missing = [field for field in fields if field not in gradebook]
+        if 'grading_policy' in missing:
+            gradebook['grading_policy'] = course_descriptor.grading_policy
+
+        if 'current_grade' in missing or 'pro_forma_grade' in missing:
+            user_queryset = StudentModule.objects.filter(
+                course_id__exact=course_key,
+                max_grade__isnull=False,
+                max_grade__gt=0,
+                grade__isnull=False,
+                student=student
+            )
+            user_scores = user_queryset.aggregate(Sum('grade'), Sum('max_grade'))
+            score_of_comp_module = user_scores['grade__sum'] or 0
+            pro_forma_grade = 0
+            if user_scores['max_grade__sum']:
+                pro_forma_grade = score_of_comp_module / float(user_scores['max_grade__sum']) * 100
+            gradebook['pro_forma_grade'] = pro_forma_grade
+
+        # grades.grade and the progress summary each build their own FieldDataCache and neither accepts a
+        # shared one, so a gradebook needing both walks the course twice; the result is cached as a whole
+        if 'grade_summary' in missing:
+            gradebook['grade_summary'] = grades.grade(student, request, course_descriptor)
+
+        if 'courseware_summary' in missing or 'current_grade' in missing:
+            courseware_summary, total_score = get_course_progress(student, request, course_descriptor)
+            gradebook['courseware_summary'] = courseware_summary
+            if 'current_grade' in missing:
+                current_grade = 0
+                if total_score:
+                    current_grade = score_of_comp_module / float(total_score) * 100
+                gradebook['current_grade'] = current_grade
+
 
 class UsersPreferences(SecureAPIView):
     """
@@ -1141,7 +1174,7 @@ class UsersRolesList(SecureListAPIView):
 
         course_id = self.request.QUERY_PARAMS.get('course_id', None)
         if course_id:
-            course_descriptor, course_key, course_content = get_course(self.request, user, course_id)  # pylint: disable=W0612
+            course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
             if not course_descriptor:
                 raise Http404
             queryset = queryset.filter(course_id=course_key)
@@ -1162,7 +1195,7 @@ class UsersRolesList(SecureListAPIView):
             raise Http404
 
         course_id = request.DATA.get('course_id', None)
-        course_descriptor, course_key, course_content = get_course(self.request, self.request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -1186,20 +1219,19 @@ class UsersRolesList(SecureListAPIView):
             return Response({}, status=status.HTTP_400_BAD_REQUEST)
         current_roles = self.get_queryset()
         for current_role in current_roles:
-            course_descriptor, course_key, course_content = get_course(request, user, unicode(current_role.course_id))  # pylint: disable=W0612
+            course_descriptor, course_key = get_course_descriptor(unicode(current_role.course_id))  # pylint: disable=W0612
             _manage_role(course_descriptor, user, current_role.role, 'revoke')
         for role in request.DATA:
             try:
                 course_id = role['course_id']
-                course_descriptor, course_key, course_content = get_course(request, user, course_id)  # pylint: disable=W0612
+                course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
                 if not course_descriptor:
                     raise ValueError  # ValueError is also thrown by the following role setters
                 _manage_role(course_descriptor, user, role['role'], 'allow')
             except ValueError:
                 # Restore the current roleset to the User
                 for current_role in current_roles:
-                    course_descriptor, course_key, course_content = get_course(
-                        request, user, unicode(current_role.course_id))  # pylint: disable=W0612
+                    course_descriptor, course_key = get_course_descriptor(unicode(current_role.course_id))  # pylint: disable=W0612
                     _manage_role(course_descriptor, user, current_role.role, 'allow')
                 return Response({}, status=status.HTTP_400_BAD_REQUEST)
         return Response(request.DATA, status=status.HTTP_200_OK)
@@ -1217,7 +1249,7 @@ class UsersRolesCoursesDetail(SecureAPIView):
         """
         DELETE /api/users/{user_id}/roles/{role}/courses/{course_id}
         """
-        course_descriptor, course_key, course_content = get_course(self.request, self.request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)  # pylint: disable=W0612
         if not course_descriptor:
             return Response({}, status=status.HTTP_404_NOT_FOUND)
 
@@ -1,7 +1,18 @@
 """ API implementation for Secure api calls. """
 
+import cPickle
+import logging
 import socket
 import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+log = logging.getLogger(__name__)
 
 
 def address_exists_in_network(ip_address, net_n_bits):
@@ -48,10 +59,28 @@ def generate_base_uri(request, strip_qs=False):
         return request.build_absolute_uri()
 
 
+def generate_uri_with_params(request, **params):
+    """
+    Build the absolute uri of the current request, replacing the provided
+    querystring parameters (used to link to the next page of a listing)
+    """
+    query = request.GET.copy()
+    for key, value in params.items():
+        query[key] = value
+    return '{}?{}'.format(request.build_absolute_uri(request.path), query.urlencode())
+
+
 def is_int(value):
     """
-    checks if a string value can be interpreted as integer
+    checks if a value is an integer, or a string which can be interpreted as integer.
+    Booleans, floats and other types are rejected rather than truncated by int()
     """
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, long)):
+        return True
+    if not isinstance(value, basestring):
+        return False
     try:
         int(value)
         return True
@@ -59,3 +88,157 @@ def is_int(value):
         return False
 
 
+def get_keyset_page_params(request, paginate_by, max_paginate_by):
+    """
+    Reads the after_id (id of the last item of the previous page) and page_size keyset paging
+    parameters of a request. Returns None when either is not an integer, otherwise (after_id, page_size):
+    after_id is None when it was not passed, and page_size is clamped to 1..max_paginate_by, falling
+    back to paginate_by when it was not passed. Both are None when neither parameter was passed
+    """
+    after_id = request.GET.get('after_id')
+    page_size = request.GET.get('page_size')
+    if after_id is None and page_size is None:
+        return None, None
+    if (after_id is not None and not is_int(after_id)) or (page_size is not None and not is_int(page_size)):
+        return None
+    if page_size is not None:
+        page_size = max(min(int(page_size), max_paginate_by), 1)
+    else:
+        page_size = paginate_by
+    return int(after_id) if after_id is not None else None, page_size
+
+
+def generate_next_page_uri(request, page_size, page_ids):
+    """
+    Build the uri of the keyset page following the page holding the items with the specified ids,
+    or return None when that page was not full, and so was the last one
+    """
+    if len(page_ids) < page_size:
+        return None
+    return generate_uri_with_params(request, after_id=page_ids[-1])
+
+
+GROUP_LIST_FIELDS = OrderedDict([
+    ('id', 'id'),
+    ('name', 'groupprofile__name'),
+    ('type', 'groupprofile__group_type'),
+])
+
+
+def get_group_list_values(queryset, fields=None, prefix=''):
+    """
+    Fetch the listing fields of a set of groups, joined to their profiles, in a single query.
+    fields is a comma-separated subset of GROUP_LIST_FIELDS (id and name by default) and prefix
+    the path from the queryset model to the group (e.g. 'group__')
+    """
+    if fields:
+        fields = [field for field in fields.split(',') if field in GROUP_LIST_FIELDS] or ['id']
+    else:
+        fields = ['id', 'name']
+    columns = [prefix + GROUP_LIST_FIELDS[field] for field in fields]
+    return [dict(zip(fields, row)) for row in queryset.values_list(*columns)]
+
+
+def get_chunked_cache_value(cache_key):
+    """
+    Reads back a value stored by set_chunked_cache_value, returning None
+    if it is missing or any of its chunks has been evicted
+    """
+    chunk_count = cache.get(cache_key)
+    if chunk_count is None:
+        return None
+    chunk_keys = ['{}.{}'.format(cache_key, index) for index in xrange(chunk_count)]
+    chunks = cache.get_many(chunk_keys)
+    if len(chunks) != chunk_count:
+        return None
+    return cPickle.loads(zlib.decompress(''.join(chunks[chunk_key] for chunk_key in chunk_keys)))
+
+
+def set_chunked_cache_value(cache_key, value, timeout):
+    """
+    Stores a value compressed and split into chunks of at most API_CACHE_CHUNK_SIZE bytes,
+    so that large values stay below the item size limit of the cache backend
+    """
+    data = zlib.compress(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))
+    chunk_size = getattr(settings, 'API_CACHE_CHUNK_SIZE', 900 * 1024)
+    values = {}
+    for index, offset in enumerate(xrange(0, len(data), chunk_size)):
+        values['{}.{}'.format(cache_key, index)] = data[offset:offset + chunk_size]
+    values[cache_key] = len(values)
+    cache.set_many(values, timeout)
+    # Backends drop values they cannot store without reporting it
+    if len(cache.get_many(values.keys())) != len(values):
+        log.warning("Value of %s (%d bytes compressed) could not be stored in the cache", cache_key, len(data))
+
+
+class TimedLRUCache(object):
+    """
+    Bounded, thread-safe in-process cache with least-recently-used eviction
+    and an optional per-entry time-to-live (in seconds)
+    """
+
+    def __init__(self, max_size=100, timeout=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key, or default when it is missing or expired
+        """
+        with self._lock:
+            try:
+                expires, value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= time.time():
+                self.misses += 1
+                return default
+            # Re-insert the entry so it becomes the most recently used one
+            self._entries[key] = (expires, value)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, timeout=None):
+        """
+        Store value under key, evicting the least recently used entries if needed
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        expires = time.time() + timeout if timeout else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Remove key from the cache, if present
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Remove all entries and reset the hit/miss counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Return the current size and hit/miss counters of the cache
+        """
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -13,7 +13,8 @@ from django.core.cache import cache
 from django.test import TestCase, Client
 from django.test.utils import override_settings
 
-from api_manager.models import GroupProfile
+from api_manager.models import CourseUserScore, GroupProfile
+from courseware.models import StudentModule
 from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
 from projects.models import Project, Workgroup
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
@@ -474,6 +475,94 @@ class WorkgroupsApiTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertGreater(len(response.data['grades']), 0)
 
+    def test_workgroups_grades_post_multiple_workgroups(self):
+        workgroup_ids = []
+        for user in (self.test_user, self.test_user2):
+            data = {
+                'name': self.test_workgroup_name,
+                'project': self.test_project.id
+            }
+            response = self.do_post(self.test_workgroups_uri, data)
+            self.assertEqual(response.status_code, 201)
+            workgroup_ids.append(response.data['id'])
+            users_uri = '{}{}/users/'.format(self.test_workgroups_uri, response.data['id'])
+            response = self.do_post(users_uri, {"id": user.id})
+            self.assertEqual(response.status_code, 201)
+
+        grades_uri = '{}{}/grades/'.format(self.test_workgroups_uri, workgroup_ids[0])
+        grade_data = {
+            'course_id': self.test_course_id,
+            'content_id': self.test_course_content_id,
+            'grades': [
+                {'workgroup_id': workgroup_ids[0], 'grade': 0.5, 'max_grade': 1},
+                {'workgroup_id': workgroup_ids[1], 'grade': 0.25, 'max_grade': 1},
+            ]
+        }
+        response = self.do_post(grades_uri, grade_data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(StudentModule.objects.get(student=self.test_user).grade, 0.5)
+        self.assertEqual(StudentModule.objects.get(student=self.test_user2).grade, 0.25)
+
+        # Grading again updates the existing modules and the course score table
+        grade_data['grades'][1]['grade'] = 0.75
+        response = self.do_post(grades_uri, grade_data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(StudentModule.objects.filter(student=self.test_user2).count(), 1)
+        self.assertEqual(StudentModule.objects.get(student=self.test_user2).grade, 0.75)
+        score = CourseUserScore.objects.get(user=self.test_user2, course_id=self.test_course_id)
+        self.assertEqual(score.points_scored, 0.75)
+
+        grade_data['grades'].append({'workgroup_id': workgroup_ids[1], 'max_grade': 1})
+        response = self.do_post(grades_uri, grade_data)
+        self.assertEqual(response.status_code, 400)
+
+    def test_workgroups_grades_post_conflicting_grades(self):
+        workgroup_ids = []
+        for users in ((self.test_user, self.test_user2), (self.test_user2,)):
+            data = {
+                'name': self.test_workgroup_name,
+                'project': self.test_project.id
+            }
+            response = self.do_post(self.test_workgroups_uri, data)
+            self.assertEqual(response.status_code, 201)
+            workgroup_ids.append(response.data['id'])
+            users_uri = '{}{}/users/'.format(self.test_workgroups_uri, response.data['id'])
+            for user in users:
+                response = self.do_post(users_uri, {"id": user.id})
+                self.assertEqual(response.status_code, 201)
+
+        grades_uri = '{}{}/grades/'.format(self.test_workgroups_uri, workgroup_ids[0])
+        grade_data = {
+            'course_id': self.test_course_id,
+            'content_id': self.test_course_content_id,
+            'grades': [
+                {'workgroup_id': workgroup_ids[0], 'grade': 0.5, 'max_grade': 1},
+                {'workgroup_id': workgroup_ids[1], 'grade': 0.25, 'max_grade': 1},
+            ]
+        }
+        # test_user2 belongs to both workgroups, so the whole batch is rejected
+        response = self.do_post(grades_uri, grade_data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.test_user2.id), response.data['detail'])
+        self.assertFalse(StudentModule.objects.filter(student__in=[self.test_user, self.test_user2]).exists())
+
+        # The same workgroup graded twice with different grades is rejected as well
+        grade_data['grades'] = [
+            {'workgroup_id': workgroup_ids[1], 'grade': 0.5, 'max_grade': 1},
+            {'workgroup_id': workgroup_ids[1], 'grade': 0.25, 'max_grade': 1},
+        ]
+        response = self.do_post(grades_uri, grade_data)
+        self.assertEqual(response.status_code, 400)
+
+        # Matching grades are not a conflict
+        grade_data['grades'] = [
+            {'workgroup_id': workgroup_ids[0], 'grade': 0.5, 'max_grade': 1},
+            {'workgroup_id': workgroup_ids[1], 'grade': 0.5, 'max_grade': 1},
+        ]
+        response = self.do_post(grades_uri, grade_data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(StudentModule.objects.get(student=self.test_user2).grade, 0.5)
+
     def test_workgroups_grades_post_invalid_course(self):
         data = {
             'name': self.test_workgroup_name,
@@ -536,6 +625,85 @@ class WorkgroupsApiTests(TestCase):
         response = self.do_post(grades_uri, grade_data)
         self.assertEqual(response.status_code, 400)
 
+    def test_workgroups_grades_post_unreleased_content(self):
+        data = {
+            'name': self.test_workgroup_name,
+            'project': self.test_project.id
+        }
+        response = self.do_post(self.test_workgroups_uri, data)
+        self.assertEqual(response.status_code, 201)
+        workgroup_id = response.data['id']
+        users_uri = '{}{}/users/'.format(self.test_workgroups_uri, workgroup_id)
+        response = self.do_post(users_uri, {"id": self.test_user.id})
+        self.assertEqual(response.status_code, 201)
+
+        staff_only = ItemFactory.create(
+            category="group_project",
+            parent_location=self.test_course.location,
+            display_name="Staff Only Group Project",
+            metadata={'visible_to_staff_only': True}
+        )
+        unreleased = ItemFactory.create(
+            category="group_project",
+            parent_location=self.test_course.location,
+            display_name="Unreleased Group Project",
+            metadata={'start': datetime(2100, 1, 1)}
+        )
+        grades_uri = '{}{}/grades/'.format(self.test_workgroups_uri, workgroup_id)
+        for content in (staff_only, unreleased):
+            grade_data = {
+                'course_id': self.test_course_id,
+                'content_id': unicode(content.scope_ids.usage_id),
+                'grade': 0.5,
+                'max_grade': 1,
+            }
+            response = self.do_post(grades_uri, grade_data)
+            self.assertEqual(response.status_code, 201)
+            student_module = StudentModule.objects.get(student=self.test_user, module_state_key=content.location)
+            self.assertEqual(student_module.grade, 0.5)
+
+    def test_workgroups_grades_post_invalid_workgroups(self):
+        data = {
+            'name': self.test_workgroup_name,
+            'project': self.test_project.id
+        }
+        response = self.do_post(self.test_workgroups_uri, data)
+        self.assertEqual(response.status_code, 201)
+        workgroup_id = response.data['id']
+        users_uri = '{}{}/users/'.format(self.test_workgroups_uri, workgroup_id)
+        response = self.do_post(users_uri, {"id": self.test_user.id})
+        self.assertEqual(response.status_code, 201)
+
+        other_course = CourseFactory.create()
+        other_project = Project.objects.create(
+            course_id=unicode(other_course.id),
+            content_id=self.test_course_content_id
+        )
+        other_workgroup = Workgroup.objects.create(name=self.test_workgroup_name, project=other_project)
+        other_workgroup.users.add(self.test_user2)
+
+        grades_uri = '{}{}/grades/'.format(self.test_workgroups_uri, workgroup_id)
+        grade_data = {
+            'course_id': self.test_course_id,
+            'content_id': self.test_course_content_id,
+            'grades': [
+                {'workgroup_id': workgroup_id, 'grade': 0.5, 'max_grade': 1},
+                {'workgroup_id': other_workgroup.id, 'grade': 0.5, 'max_grade': 1},
+                {'workgroup_id': 987654, 'grade': 0.5, 'max_grade': 1},
+            ]
+        }
+        # Unknown workgroups and workgroups of another course reject the whole batch
+        response = self.do_post(grades_uri, grade_data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(other_workgroup.id), response.data['detail'])
+        self.assertIn('987654', response.data['detail'])
+        self.assertFalse(StudentModule.objects.filter(student__in=[self.test_user, self.test_user2]).exists())
+
+        grade_data['grades'] = grade_data['grades'][:1]
+        response = self.do_post(grades_uri, grade_data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(StudentModule.objects.get(student=self.test_user).grade, 0.5)
+
     def test_workgroups_grades_post_invalid_requests(self):
         data = {
             'name': self.test_workgroup_name,
@@ -4,28 +4,23 @@
 """ WORKGROUPS API VIEWS """
 from django.contrib.auth.models import Group, User
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.utils import timezone
 
 from rest_framework import viewsets
 from rest_framework.decorators import action, link
 from rest_framework import status
 from rest_framework.response import Response
 
-from xblock.fields import Scope
-from xblock.runtime import KeyValueStore
-
-
-from courseware import module_render
-from courseware.courses import get_course
-from courseware.model_data import FieldDataCache
-from opaque_keys import InvalidKeyError
-from opaque_keys.edx.keys import CourseKey, UsageKey
-from opaque_keys.edx.locations import SlashSeparatedCourseKey, Location
-from xmodule.modulestore import Location, InvalidLocationError
+from courseware.models import StudentModule
 from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.exceptions import ItemNotFoundError
 from course_groups.cohorts import (add_cohort, add_user_to_cohort, get_cohort_by_name,
                                    remove_user_from_cohort)
 from course_groups.models import CourseUserGroup
-from xmodule.modulestore import Location
+
+from api_manager.courseware_access import get_course_descriptor, get_course_key, get_usage_key
+from api_manager.models import CourseUserScore, invalidate_user_grades
 
 from .models import Project, Workgroup, WorkgroupSubmission
 from .models import WorkgroupReview, WorkgroupSubmissionReview, WorkgroupPeerReview
@@ -34,62 +29,42 @@ from .serializers import ProjectSerializer, WorkgroupSerializer, WorkgroupSubmis
 from .serializers import WorkgroupReviewSerializer, WorkgroupSubmissionReviewSerializer, WorkgroupPeerReviewSerializer
 
 
-def _get_course(request, user, course_id, depth=0):
-    """
-    Utility method to obtain course components
+@transaction.commit_on_success
+def _save_user_grades(course_key, content_key, user_grades):
     """
-    course_descriptor = None
-    course_key = None
-    course_content = None
-    try:
-        course_key = CourseKey.from_string(course_id)
-    except InvalidKeyError:
-        try:
-            course_key = SlashSeparatedCourseKey.from_deprecated_string(course_id)
-        except InvalidKeyError:
-            pass
-    if course_key:
-        try:
-            course_descriptor = get_course(course_key, depth=depth)
-        except ValueError:
-            pass
-    if course_descriptor:
-        field_data_cache = FieldDataCache([course_descriptor], course_key, user)
-        course_content = module_render.get_module(
-            user,
-            request,
-            course_descriptor.location,
-            field_data_cache,
-            course_key)
-    return course_descriptor, course_key, course_content
-
-
-def _get_course_child(request, user, course_key, content_id):
+    Writes the (grade, max_grade) pairs of user_grades, a dict keyed by user id, to the StudentModule rows
+    of the specified content, creating the missing rows in bulk and updating the rest in one query per grade
     """
-    Return a course xmodule/xblock to the caller
-    """
-    content_descriptor = None
-    content_key = None
-    content = None
-    try:
-        content_key = UsageKey.from_string(content_id)
-    except InvalidKeyError:
-        try:
-            content_key = Location.from_deprecated_string(content_id)
-        except (InvalidKeyError, InvalidLocationError):
-            pass
-    if content_key:
-        store = modulestore()
-        content_descriptor = store.get_item(content_key)
-    if content_descriptor:
-        field_data_cache = FieldDataCache([content_descriptor], course_key, user)
-        content = module_render.get_module(
-            user,
-            request,
-            content_key,
-            field_data_cache,
-            course_key)
-    return content_descriptor, content_key, content
+    existing = dict(StudentModule.objects.filter(
+        course_id=course_key,
+        module_state_key=content_key,
+        student__in=user_grades.keys()
+    ).values_list('student', 'id'))
+
+    updates = {}
+    new_modules = []
+    for user_id, (grade, max_grade) in user_grades.iteritems():
+        if user_id in existing:
+            updates.setdefault((grade, max_grade), []).append(existing[user_id])
+        else:
+            new_modules.append(StudentModule(
+                student_id=user_id,
+                course_id=course_key,
+                module_state_key=content_key,
+                module_type=content_key.category,
+                state='{}',
+                grade=grade,
+                max_grade=max_grade
+            ))
+    for (grade, max_grade), module_ids in updates.iteritems():
+        StudentModule.objects.filter(id__in=module_ids).update(grade=grade, max_grade=max_grade,
+                                                               modified=timezone.now())
+    StudentModule.objects.bulk_create(new_modules)
+
+    # Bulk writes skip the StudentModule signals which maintain the score table and cached grades
+    CourseUserScore.refresh(course_key, user_grades.keys())
+    for user_id in user_grades:
+        invalidate_user_grades(unicode(course_key), user_id)
 
 
 class GroupViewSet(viewsets.ModelViewSet):
@@ -124,7 +99,7 @@ class WorkgroupsViewSet(viewsets.ModelViewSet):
         if response.status_code == status.HTTP_201_CREATED:
             # create the workgroup cohort
             workgroup = self.object
-            course_descriptor, course_key, course_content = _get_course(self.request, self.request.user, workgroup.project.course_id)  # pylint: disable=W0612
+            course_key = get_course_key(workgroup.project.course_id)
             add_cohort(course_key, workgroup.cohort_name, CourseUserGroup.WORKGROUP)
 
         return response
@@ -181,7 +156,7 @@ class WorkgroupsViewSet(viewsets.ModelViewSet):
 
             # add user to the workgroup cohort, create it if it doesn't exist (for cases where there is a legacy
             # workgroup)
-            course_descriptor, course_key, course_content = _get_course(self.request, user, workgroup.project.course_id)  # pylint: disable=W0612
+            course_key = get_course_key(workgroup.project.course_id)
             try:
                 cohort = get_cohort_by_name(course_key, workgroup.cohort_name, CourseUserGroup.WORKGROUP)
                 add_user_to_cohort(cohort, user.username)
@@ -200,7 +175,7 @@ class WorkgroupsViewSet(viewsets.ModelViewSet):
                 message = 'User {} does not exist'.format(user_id)
                 return Response({"detail": message}, status.HTTP_400_BAD_REQUEST)
             workgroup = self.get_object()
-            course_descriptor, course_key, course_content = _get_course(self.request, user, workgroup.project.course_id)  # pylint: disable=W0612
+            course_key = get_course_key(workgroup.project.course_id)
             cohort = get_cohort_by_name(course_key,
                                         workgroup.cohort_name, CourseUserGroup.WORKGROUP)
             workgroup.users.remove(user)
@@ -249,46 +224,92 @@ class WorkgroupsViewSet(viewsets.ModelViewSet):
     @action()
     def grades(self, request, pk):
         """
-        Submit a grade for a Workgroup.  The grade will be applied to all members of the workgroup
+        Submit a grade for a Workgroup.  The grade will be applied to all members of the workgroup.
+        Grades for several workgroups can be submitted at once as a list of
+        {"workgroup_id": ..., "grade": ..., "max_grade": ...} objects in "grades".
+        A batch giving a user (or workgroup) two different grades, or naming a workgroup which is not part
+        of the course, is rejected as a whole
         """
         # Ensure we received all of the necessary information
         course_id = request.DATA.get('course_id')
         if course_id is None:
             return Response({}, status=status.HTTP_400_BAD_REQUEST)
-        course_descriptor, course_key, course_content = _get_course(request, request.user, course_id)  # pylint: disable=W0612
+        course_descriptor, course_key = get_course_descriptor(course_id)
         if not course_descriptor:
             return Response({}, status=status.HTTP_400_BAD_REQUEST)
 
         content_id = request.DATA.get('content_id')
         if content_id is None:
             return Response({}, status=status.HTTP_400_BAD_REQUEST)
-        content_descriptor, content_key, content = _get_course_child(request, request.user, course_key, content_id)  # pylint: disable=W0612
-        if content_descriptor is None:
+        content_key = get_usage_key(content_id)
+        if content_key is None:
             return Response({}, status=status.HTTP_400_BAD_REQUEST)
-
-        grade = request.DATA.get('grade')
-        if grade is None:
+        # Grades may be posted for content which is not yet released (or is staff-only),
+        # so the content is loaded without checking the requesting user's access to it
+        try:
+            modulestore().get_item(content_key)
+        except ItemNotFoundError:
             return Response({}, status=status.HTTP_400_BAD_REQUEST)
 
-        max_grade = request.DATA.get('max_grade')
-        if max_grade is None:
+        workgroup_grades = request.DATA.get('grades')
+        if workgroup_grades is None:
+            workgroup_grades = [{
+                'workgroup_id': pk,
+                'grade': request.DATA.get('grade'),
+                'max_grade': request.DATA.get('max_grade'),
+            }]
+        if not isinstance(workgroup_grades, list):
             return Response({}, status=status.HTTP_400_BAD_REQUEST)
-        if grade > max_grade:
-            max_grade = grade
-
-        users = User.objects.filter(workgroups=pk)
-        for user in users:
-            key = KeyValueStore.Key(
-                scope=Scope.user_state,
-                user_id=user.id,
-                block_scope_id=content_key,
-                field_name='grade'
+
+        grades_by_workgroup = {}
+        for workgroup_grade in workgroup_grades:
+            if not isinstance(workgroup_grade, dict):
+                return Response({}, status=status.HTTP_400_BAD_REQUEST)
+            grade = workgroup_grade.get('grade')
+            if grade is None:
+                return Response({}, status=status.HTTP_400_BAD_REQUEST)
+
+            max_grade = workgroup_grade.get('max_grade')
+            if max_grade is None:
+                return Response({}, status=status.HTTP_400_BAD_REQUEST)
+            if grade > max_grade:
+                max_grade = grade
+            try:
+                workgroup_id = int(workgroup_grade.get('workgroup_id', pk))
+            except (TypeError, ValueError):
+                return Response({}, status=status.HTTP_400_BAD_REQUEST)
+            if grades_by_workgroup.get(workgroup_id, (grade, max_grade)) != (grade, max_grade):
+                message = 'Workgroup {} is given more than one grade'.format(workgroup_id)
+                return Response({"detail": message}, status.HTTP_400_BAD_REQUEST)
+            grades_by_workgroup[workgroup_id] = (grade, max_grade)
+
+        course_workgroup_ids = set(Workgroup.objects.filter(
+            id__in=grades_by_workgroup.keys(),
+            project__course_id__in=set([course_id, unicode(course_key)])
+        ).values_list('id', flat=True))
+        invalid_workgroup_ids = set(grades_by_workgroup.keys()) - course_workgroup_ids
+        if invalid_workgroup_ids:
+            message = 'Workgroups {} do not exist in course {}'.format(
+                ', '.join(str(workgroup_id) for workgroup_id in sorted(invalid_workgroup_ids)),
+                course_id
+            )
+            return Response({"detail": message}, status.HTTP_400_BAD_REQUEST)
+
+        user_grades = {}
+        conflicting_user_ids = set()
+        members = Workgroup.users.through.objects.filter(workgroup__in=grades_by_workgroup.keys())\
+            .values_list('user', 'workgroup')
+        for user_id, workgroup_id in members:
+            if user_grades.get(user_id, grades_by_workgroup[workgroup_id]) != grades_by_workgroup[workgroup_id]:
+                conflicting_user_ids.add(user_id)
+            user_grades[user_id] = grades_by_workgroup[workgroup_id]
+        if conflicting_user_ids:
+            message = 'Users {} are given different grades by their workgroups'.format(
+                ', '.join(str(user_id) for user_id in sorted(conflicting_user_ids))
             )
-            field_data_cache = FieldDataCache([course_descriptor], course_key, user)
-            student_module = field_data_cache.find_or_create(key)
-            student_module.grade = grade
-            student_module.max_grade = max_grade
-            student_module.save()
+            return Response({"detail": message}, status.HTTP_400_BAD_REQUEST)
+        if user_grades:
+            _save_user_grades(course_key, content_key, user_grades)
         return Response({}, status=status.HTTP_201_CREATED)
 
 